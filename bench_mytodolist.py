@@ -0,0 +1,161 @@
+"""Offline benchmarks for EventManager.
+
+Generates a synthetic events file and reports time, peak memory and throughput
+for load/save/add/remove/filter/summarize as JSON, e.g.
+
+    python bench_mytodolist.py --events 1000 100000 1000000 --output run.json
+    python bench_mytodolist.py --events 100000 --baseline run.json
+
+With --baseline the run is compared against an earlier result file and the
+exit status is 1 if an operation got slower than the allowed tolerance.
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+from core_mytodolist import FIELDNAMES, Event, EventManager
+
+NAMES = ["Meeting", "Standup", "Lunch", "Call", "Review", "Gym", "Dentist", "Groceries", "Report", "Workshop"]
+NOTIFICATIONS = ["Email", "SMS", "None"]
+
+def generate_events(count, categories=10, days=365, start=None, seed=0):
+    """Yield count reproducible events spread over days days, using categories distinct categories.
+
+    By default the spread is centred on today, so the today/this_week/this_month
+    queries all find events.
+    """
+    rng = random.Random(seed)
+    if start is None:
+        today = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        start = today - timedelta(days=days // 2)
+    minutes = days * 24 * 60
+    for idx in range(count):
+        yield Event(
+            f"{rng.choice(NAMES)} {idx % 1000}",
+            start + timedelta(minutes=rng.randrange(minutes)),
+            rng.choice(["", "Bring notes", "Discuss project", "Follow up, then report"]),
+            f"Category {rng.randrange(categories)}",
+            rng.choice(NOTIFICATIONS),
+        )
+
+def write_events_csv(filename, events):
+    with open(filename, mode='w', newline='') as file:
+        writer = csv.DictWriter(file, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        for event in events:
+            writer.writerow(event.to_dict())
+
+def measure(function, items, memory=True):
+    """Run function once and return its time, throughput and (optionally, in a second traced run) peak memory."""
+    started = time.perf_counter()
+    function()
+    seconds = time.perf_counter() - started
+    result = {"seconds": seconds, "items": items, "items_per_second": items / seconds if seconds else None}
+    if memory:
+        tracemalloc.start()
+        try:
+            function()
+            result["peak_memory_bytes"] = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result
+
+def run_benchmark(count, categories=10, days=365, adds=20, memory=True, **options):
+    """Benchmark one EventManager configuration on count synthetic events and return the results."""
+    results = {}
+    with tempfile.TemporaryDirectory() as directory:
+        filename = os.path.join(directory, "events.csv")
+        write_events_csv(filename, generate_events(count, categories, days))
+        if options.get("mapped") or options.get("archive_after") is not None:
+            # Builds the binary snapshot or moves the history to the archive, so the load below measures a cold start
+            EventManager(filename, **options)
+        results["load_events"] = measure(lambda: EventManager(filename, **options), count, memory)
+
+        manager = EventManager(filename, **options)
+        results["save_events"] = measure(manager.save_events, count, memory)
+
+        new_events = list(generate_events(adds, categories, days, seed=1))
+
+        def add_events():
+            for event in new_events:
+                manager.add_event(event.name, event.date, event.comments, event.category, event.notifications)
+
+        def remove_events():
+            for _ in range(adds):
+                manager.remove_event(len(manager.events) - 1)
+
+        # Each traced rerun adds/removes the same number of events again, so the size stays comparable
+        results["add_event"] = measure(add_events, adds, False)
+        results["remove_event"] = measure(remove_events, adds, False)
+        for timeframe in ["today", "this_week", "this_month"]:
+            results[f"filter_events:{timeframe}"] = measure(lambda: manager.filter_events(timeframe), 1, memory)
+            results[f"summarize_events:{timeframe}"] = measure(lambda: manager.summarize_events(timeframe), 1, memory)
+        manager.close()
+    return results
+
+def compare_results(baseline, current, tolerance=0.25):
+    """Return the operations whose time grew by more than tolerance (a fraction) against a baseline run."""
+    regressions = []
+    for size, operations in current["runs"].items():
+        for operation, result in operations.items():
+            before = baseline.get("runs", {}).get(size, {}).get(operation)
+            if before and result["seconds"] > before["seconds"] * (1 + tolerance):
+                regressions.append({"events": size, "operation": operation, "baseline_seconds": before["seconds"],
+                                    "seconds": result["seconds"]})
+    return regressions
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, nargs="+", default=[1000, 10000, 100000],
+                        help="number of events to generate; several values run a scale series")
+    parser.add_argument("--categories", type=int, default=10, help="number of distinct categories")
+    parser.add_argument("--days", type=int, default=365, help="number of days the events are spread over")
+    parser.add_argument("--adds", type=int, default=20, help="number of events added and removed")
+    parser.add_argument("--columnar", action="store_true", help="benchmark the columnar EventStore")
+    parser.add_argument("--journaled", action="store_true", help="benchmark the journaled mode")
+    parser.add_argument("--mapped", action="store_true", help="benchmark loading from the binary snapshot")
+    parser.add_argument("--parallel", action="store_true", help="benchmark the parallel load (one worker per CPU)")
+    parser.add_argument("--archive-after", type=int, metavar="DAYS",
+                        help="benchmark tiering, with events older than this in the compressed archive")
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced runs that measure peak memory")
+    parser.add_argument("--output", help="write the JSON results to this file instead of stdout")
+    parser.add_argument("--baseline", help="compare against an earlier JSON result and fail on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown against the baseline")
+    args = parser.parse_args(argv)
+
+    options = {"columnar": args.columnar, "journaled": args.journaled, "mapped": args.mapped,
+               "parallel": args.parallel, "archive_after": args.archive_after}
+    report = {
+        "environment": {"python": sys.version.split()[0], "implementation": platform.python_implementation(),
+                        "platform": platform.platform(), "cpus": os.cpu_count()},
+        "config": {"categories": args.categories, "days": args.days, "adds": args.adds, **options},
+        "runs": {},
+    }
+    for count in args.events:
+        report["runs"][str(count)] = run_benchmark(count, args.categories, args.days, args.adds,
+                                                   not args.no_memory, **options)
+
+    status = 0
+    if args.baseline:
+        with open(args.baseline) as file:
+            report["regressions"] = compare_results(json.load(file), report, args.tolerance)
+        status = 1 if report["regressions"] else 0
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+    return status
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""Command line interface to the ToDo list events, for scripts and cron jobs.
+
+Works on the same files as the app, without importing Streamlit, e.g.
+
+    python cli_mytodolist.py add "Dentist" "14-03-2025 09:30" --category Health
+    python cli_mytodolist.py --user alice filter this_week --category Work
+    python cli_mytodolist.py export backup.jsonl --start 01-01-2025
+    python cli_mytodolist.py import events.ndjson
+    python cli_mytodolist.py --user alice migrate
+    python cli_mytodolist.py notify --lead 15 --email me@example.com
+
+Dates are 'DD-MM-YYYY HH:MM'; --start/--end also take a bare 'DD-MM-YYYY'.
+A file name of - means stdin or stdout. Archived events (see --archive-after)
+are always included; list and export read only the months they reach.
+notify is meant to run from cron, e.g. every minute: each run sends the
+reminders that fell due since the last one.
+"""
+import argparse
+import sys
+from datetime import datetime, timedelta
+
+from core_mytodolist import (EventManager, EventShards, Event, LogFileSink, NotificationDispatcher, SmtpSink,
+                             file_format, parse_event_date)
+
+TIMEFRAMES = ["today", "this_week", "this_month"]
+
+def parse_bound(text):
+    """Parse a --start/--end date, with or without a time."""
+    try:
+        return parse_event_date(text)
+    except ValueError:
+        return datetime.strptime(text, '%d-%m-%Y')
+
+def event_date(text):
+    try:
+        return parse_event_date(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date {text!r}, expected DD-MM-YYYY HH:MM")
+
+def bound_date(text):
+    try:
+        return parse_bound(text)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"invalid date {text!r}, expected DD-MM-YYYY [HH:MM]")
+
+def format_event(event):
+    return f"{event.id}\t{event.date.strftime('%d-%m-%Y %H:%M')}\t{event.name}\t{event.category}"
+
+def open_manager(args):
+    # atomic, so a job running next to the app (or another job) never leaves a torn file behind
+    if args.user is not None:
+        return EventShards(args.shards, atomic=True, archive_after=args.archive_after).manager(args.user)
+    return EventManager(args.file, atomic=True, archive_after=args.archive_after)
+
+def run_command(args, manager, out):
+    """Run one parsed command against manager, writing to out, and return the exit status."""
+    if args.command == "add":
+        event = Event(args.name, args.date, args.comments, args.category, args.notifications)
+        manager.add_events([event])
+        print(event.id, file=out)
+    elif args.command == "remove":
+        status = 0
+        for event_id in args.ids:
+            if manager.remove_event_by_id(event_id) is None:
+                print(f"no event with ID {event_id}", file=sys.stderr)
+                status = 1
+        return status
+    elif args.command == "list":
+        for event in manager.iter_events(args.start, args.end, args.category or None):
+            print(format_event(event), file=out)
+    elif args.command == "filter":
+        for event in manager.filter_events(args.timeframe, args.category, args.keywords):
+            print(format_event(event), file=out)
+    elif args.command == "summarize":
+        for category, count in manager.summarize_events(args.timeframe).items():
+            print(f"{category}: {count} event(s)", file=out)
+    elif args.command == "import":
+        source = sys.stdin if args.source == "-" else args.source
+        added, skipped = manager.import_events(source, args.format or file_format(args.source))
+        print(f"{added} event(s) imported", file=out)
+        if skipped:
+            print(f"{skipped} invalid record(s) skipped", file=sys.stderr)
+            return 1
+    elif args.command == "export":
+        target = out if args.target == "-" else args.target
+        written = manager.export_events(target, args.format or file_format(args.target),
+                                        args.start, args.end, args.category or None)
+        if args.target != "-":
+            print(f"{written} event(s) exported", file=out)
+    elif args.command == "notify":
+        sink = SmtpSink(args.email, host=args.smtp_host, port=args.smtp_port) if args.email else LogFileSink(args.log)
+        # The state file remembers up to when reminders went out, so the next run picks up from there
+        dispatcher = NotificationDispatcher(manager, {"email": sink}, lead=timedelta(minutes=args.lead),
+                                            state_filename=manager.filename + ".notify.json")
+        try:
+            sent = dispatcher.tick()
+        finally:
+            dispatcher.stop()
+        print(f"{sent} reminder(s) sent", file=out)
+        if dispatcher.failed:
+            print(f"{dispatcher.failed} reminder(s) failed and are retried on the next run", file=sys.stderr)
+            return 1
+    return 0
+
+def build_parser():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--file", default="events.csv", help="events file (default: events.csv)")
+    parser.add_argument("--user", help="work on this user's shard instead of --file")
+    parser.add_argument("--shards", default="event_shards", help="directory of the per-user shards")
+    parser.add_argument("--archive-after", type=int, metavar="DAYS",
+                        help="move events older than this many days to the compressed archive")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    add = commands.add_parser("add", help="add an event and print its ID")
+    add.add_argument("name")
+    add.add_argument("date", type=event_date)
+    add.add_argument("--comments", default="")
+    add.add_argument("--category", default="")
+    add.add_argument("--notifications", default="")
+
+    remove = commands.add_parser("remove", help="remove events by ID")
+    remove.add_argument("ids", nargs="+", metavar="id")
+
+    for name, description in [("list", "list events in date order"),
+                              ("export", "write events as CSV or JSON Lines")]:
+        command = commands.add_parser(name, help=description)
+        if name == "export":
+            command.add_argument("target", help="file to write, - for stdout")
+            command.add_argument("--format", choices=["csv", "jsonl"], help="default: from the file extension")
+        command.add_argument("--start", type=bound_date, help="only events on or after this date")
+        command.add_argument("--end", type=bound_date, help="only events before this date")
+        command.add_argument("--category", default="")
+
+    filter_ = commands.add_parser("filter", help="list the events of a timeframe")
+    filter_.add_argument("timeframe", choices=TIMEFRAMES)
+    filter_.add_argument("--category", default="")
+    filter_.add_argument("--keywords", default="", help="words that must appear in name, comments or category")
+
+    summarize = commands.add_parser("summarize", help="count the events of a timeframe per category")
+    summarize.add_argument("timeframe", choices=TIMEFRAMES)
+
+    import_ = commands.add_parser("import", help="add the events of a CSV or JSON Lines file")
+    import_.add_argument("source", help="file to read, - for stdin")
+    import_.add_argument("--format", choices=["csv", "jsonl"], help="default: from the file extension")
+
+    notify = commands.add_parser("notify", help="send the reminders of events with Email notifications that fell "
+                                                "due since the last run")
+    notify.add_argument("--lead", type=int, default=0, metavar="MINUTES", help="remind this long before an event")
+    notify.add_argument("--email", help="send reminders to this address instead of writing them to --log")
+    notify.add_argument("--smtp-host", default="localhost")
+    notify.add_argument("--smtp-port", type=int, default=25)
+    notify.add_argument("--log", default="notifications.log", help="reminder log file (default: notifications.log)")
+
+    commands.add_parser("migrate", help="copy --file (e.g. the events.csv shared before shards) into the shard of "
+                                        "--user, once")
+    return parser
+
+def migrate(args, out):
+    try:
+        shard = EventShards(args.shards).migrate(args.user, args.file)
+    except FileExistsError as error:
+        print(error, file=sys.stderr)
+        return 1
+    print(f"{args.file} copied to {shard}", file=out)
+    return 0
+
+def main(argv=None, out=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if args.command == "migrate":
+        if args.user is None:
+            parser.error("migrate needs --user")
+        return migrate(args, out or sys.stdout)
+    manager = open_manager(args)
+    try:
+        return run_command(args, manager, out or sys.stdout)
+    finally:
+        manager.close()
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,2582 @@
+"""Data layer of the ToDo list app: events, their storage, indexes and reminders.
+
+Nothing here imports Streamlit, so scripts, batch jobs (see cli_mytodolist.py)
+and tests can use it without the UI and its dependencies.
+"""
+import atexit
+import bisect
+import csv
+from array import array
+from contextlib import contextmanager, nullcontext, suppress
+import functools
+import gc
+import gzip
+import hashlib
+import heapq
+import io
+import itertools
+import json
+import logging
+import mmap
+import operator
+import os
+import re
+import shutil
+import sqlite3
+import struct
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter, OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+try:
+    import fcntl
+except ImportError:  # no fcntl on Windows; saves are then atomic but not locked between processes
+    fcntl = None
+
+class Instrumentation:
+    """Call counters and latency histograms for the hot paths of the app.
+
+    Functions decorated with timed() record into it while `enabled` is true;
+    when it is false a decorated call costs a single attribute check.
+    """
+
+    # Upper bounds of the latency histogram buckets, in milliseconds
+    buckets = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._lock = threading.Lock()
+        self._stats = {}
+
+    def record(self, name, seconds):
+        milliseconds = seconds * 1000
+        with self._lock:
+            stats = self._stats.get(name)
+            if stats is None:
+                stats = self._stats[name] = {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                                             'histogram': [0] * (len(self.buckets) + 1)}
+            stats['count'] += 1
+            stats['total_ms'] += milliseconds
+            stats['max_ms'] = max(stats['max_ms'], milliseconds)
+            stats['histogram'][bisect.bisect_left(self.buckets, milliseconds)] += 1
+
+    @contextmanager
+    def span(self, name):
+        """Time a block of code under name."""
+        if not self.enabled:
+            yield
+            return
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def snapshot(self):
+        """Return the statistics as plain data, with the histogram keyed by bucket upper bound."""
+        labels = [f'<={bound}ms' for bound in self.buckets] + [f'>{self.buckets[-1]}ms']
+        with self._lock:
+            return {name: {'count': stats['count'], 'total_ms': round(stats['total_ms'], 3),
+                           'mean_ms': round(stats['total_ms'] / stats['count'], 3),
+                           'max_ms': round(stats['max_ms'], 3),
+                           'histogram': {label: count for label, count in zip(labels, stats['histogram']) if count}}
+                    for name, stats in sorted(self._stats.items())}
+
+    def to_json(self):
+        return json.dumps({'enabled': self.enabled, 'timers': self.snapshot()}, indent=2)
+
+    def reset(self):
+        with self._lock:
+            self._stats = {}
+
+    @contextmanager
+    def profile(self, filename):
+        """Run the block under cProfile and dump the profile to filename."""
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            profiler.dump_stats(filename)
+
+# One per process: modules are imported once, so this also survives Streamlit reruns
+instrumentation = Instrumentation(enabled=os.environ.get('TODO_INSTRUMENTATION', '1') != '0')
+
+def timed(name):
+    """Decorator recording the latency of every call into the instrumentation under name."""
+    def decorate(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not instrumentation.enabled:
+                return function(*args, **kwargs)
+            started = time.perf_counter()
+            try:
+                return function(*args, **kwargs)
+            finally:
+                instrumentation.record(name, time.perf_counter() - started)
+        return wrapper
+    return decorate
+
+class ImageCache:
+    """Bounded cache of page images, keyed by path, modification time and display width.
+
+    Each image is read (and optionally downscaled) once instead of on every rerun.
+    """
+
+    def __init__(self, max_entries=8):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    @timed('ImageCache.get')
+    def get(self, image_path, max_width=None):
+        """Return the image bytes, downscaled to max_width pixels when that is smaller than the image."""
+        key = (image_path, os.stat(image_path).st_mtime_ns, max_width)
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        with open(image_path, "rb") as img_file:
+            data = self._resize(img_file.read(), max_width)
+        with self._lock:
+            self._entries[key] = data
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return data
+
+    @staticmethod
+    def _resize(data, max_width):
+        if max_width is None:
+            return data
+        # Imported here, so the CLI and other users of the events never load Pillow
+        try:
+            from PIL import Image
+        except ImportError:  # Pillow is optional; images are then served as they are on disk
+            return data
+        image = Image.open(io.BytesIO(data))
+        if image.width <= max_width:
+            return data
+        image.thumbnail((max_width, max_width * image.height // image.width))
+        output = io.BytesIO()
+        image.convert("RGB").save(output, format="JPEG", quality=85, optimize=True)
+        return output.getvalue()
+
+FIELDNAMES = ['name', 'date', 'comments', 'category', 'notifications', 'id']
+
+def new_event_id():
+    """Return a new random event ID (16 hex digits), unique across sessions and processes."""
+    return os.urandom(8).hex()
+
+def derived_event_id(text):
+    """Return the ID hashed from text (16 hex digits, like new_event_id()) for a stored row that has none."""
+    return hashlib.blake2b(text.encode('utf-8'), digest_size=8).hexdigest()
+
+def numbered_event_id(fields_hash, record):
+    """Return the ID of a stored row without one from the hash of its fields and its record number in the file."""
+    return derived_event_id('%s:%d' % (fields_hash, record))
+
+@contextmanager
+def file_lock(path):
+    """Hold an exclusive inter-process lock on the lock file at path while the block runs."""
+    with open(path, 'a') as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+def parse_event_date(text):
+    """Parse a 'DD-MM-YYYY HH:MM' date.
+
+    Text in exactly that layout is rearranged into ISO form for the C-level
+    fromisoformat, which is several times faster than strptime. Its separators
+    are checked first, as fromisoformat also takes others (and UTC offsets).
+    Anything else goes through strptime, which stays the strict reference
+    parser and raises ValueError for malformed dates.
+    """
+    if len(text) == 16 and text[2] == text[5] == '-' and text[10] == ' ' and text[13] == ':' and text.isascii():
+        try:
+            date = datetime.fromisoformat(text[6:10] + '-' + text[3:5] + '-' + text[:2] + text[10:])
+        except ValueError:
+            pass
+        else:
+            if date.tzinfo is None:
+                return date
+    return datetime.strptime(text, '%d-%m-%Y %H:%M')
+
+# Class for Event and EventManager
+class Event:
+    __slots__ = ('name', 'date', 'comments', 'category', 'notifications', 'id')
+
+    def __init__(self, name, date, comments, category, notifications, id=None):
+        self.name = name
+        self.date = date
+        self.comments = comments
+        self.category = category
+        self.notifications = notifications
+        # Stable identity of a stored event; EventManager assigns one when an event is added
+        self.id = id
+
+    def to_dict(self):
+        row = {
+            'name': self.name,
+            'date': self.date.strftime('%d-%m-%Y %H:%M'),
+            'comments': self.comments,
+            'category': self.category,
+            'notifications': self.notifications
+        }
+        if self.id is not None:
+            row['id'] = self.id
+        return row
+
+class CsvEventReader:
+    """Streams events out of the lines of an events CSV file.
+
+    Columns are read by position. Lines without quotes are split directly; only
+    quoted records (which may span several lines) go through the csv module.
+    Rows that cannot be parsed are skipped and counted in `errors`. Rows without
+    an id (files written before events had IDs) get one hashed from their fields
+    and their record number, so it is the same on every read until the file is
+    saved with IDs, and identical rows still get distinct ones.
+    """
+
+    # Bounds the date-string cache so that streaming a huge file runs in constant memory
+    max_cached_dates = 100000
+
+    def __init__(self):
+        self.errors = 0
+        self._dates = {}
+        # Records (valid or not) seen by the last read, which numbers the rows without an ID
+        self.records = 0
+        # Set to a list to collect (position among the events read, fields hash, record number)
+        # for each row whose ID was derived
+        self.derived = None
+
+    def read(self, lines, start=None, end=None, category=None):
+        """Yield the events with start <= date < end (either bound optional), optionally matching a category.
+
+        Rows are filtered before their date is parsed or an Event is built.
+        """
+        lines = iter(lines)
+        header = next(csv.reader(lines), None)
+        if header is None:
+            return
+        fields = operator.itemgetter(*[header.index(field) for field in FIELDNAMES[:5]])
+        id_column = header.index('id') if 'id' in header else None
+        category = category.lower() if category else None
+        # The same date string shows up many times in a history, so each one is parsed once
+        dates = self._dates
+        self.records = position = 0
+        for line in lines:
+            if '"' in line:
+                record = [line]
+                while sum(part.count('"') for part in record) % 2:
+                    line = next(lines, None)
+                    if line is None:
+                        break
+                    record.append(line)
+                row = next(csv.reader(record), [])
+            else:
+                line = line.rstrip('\r\n')
+                if not line:
+                    continue
+                row = line.split(',')
+            if not row:
+                continue
+            self.records += 1
+            try:
+                name, text, comments, event_category, notifications = fields(row)
+            except IndexError:
+                self.errors += 1
+                continue
+            if category is not None and category not in event_category.lower():
+                continue
+            date = dates.get(text)
+            if date is None:
+                try:
+                    date = parse_event_date(text)
+                except ValueError:
+                    self.errors += 1
+                    continue
+                if len(dates) >= self.max_cached_dates:
+                    dates.clear()
+                dates[text] = date
+            if (start is not None and date < start) or (end is not None and date >= end):
+                continue
+            event_id = row[id_column] if id_column is not None and id_column < len(row) else ''
+            if not event_id:
+                fields_hash = derived_event_id('\x1f'.join((name, text, comments, event_category, notifications)))
+                event_id = numbered_event_id(fields_hash, self.records)
+                if self.derived is not None:
+                    self.derived.append((position, fields_hash, self.records))
+            position += 1
+            yield Event(name, date, comments, event_category, notifications, event_id)
+
+def split_csv(filename, chunks):
+    """Split an events CSV into its header and up to `chunks` byte ranges of whole records.
+
+    A newline only ends a record outside quotes, that is after an even number of
+    quote characters (an escaped quote counts twice), so each boundary is the
+    first such newline after an even split point. Returns (header, [(start, end)]).
+    """
+    with open(filename, 'rb') as file:
+        size = os.fstat(file.fileno()).st_size
+        header = file.readline()
+        bounds = [len(header)]
+        quotes = 0
+        position = len(header)
+        for part in range(1, chunks):
+            target = len(header) + (size - len(header)) * part // chunks
+            if target <= position:
+                continue
+            # Quotes up to the split point, read in blocks, then whole lines until one ends outside quotes
+            while position < target:
+                block = file.read(min(1 << 20, target - position))
+                quotes += block.count(b'"')
+                position += len(block)
+            while True:
+                line = file.readline()
+                quotes += line.count(b'"')
+                position += len(line)
+                if not line or quotes % 2 == 0:
+                    break
+            if position >= size:
+                break
+            bounds.append(position)
+        bounds.append(size)
+    return header, [(start, end) for start, end in zip(bounds, bounds[1:]) if start < end]
+
+def read_csv_chunk(filename, header, start, end):
+    """Parse the records between two byte offsets of an events CSV into an EventStore's columns.
+
+    Runs in the worker processes of a parallel load. Columns (see
+    EventStore.columns()) are much cheaper to send back than Event objects.
+    Returns (columns, errors, derived, records), the last two being the
+    reader's `derived` and `records`.
+    """
+    with open(filename, 'rb') as file:
+        file.seek(start)
+        data = file.read(end - start)
+    reader = CsvEventReader()
+    reader.derived = []
+    store = EventStore(reader.read(io.TextIOWrapper(io.BytesIO(header + data), newline='')))
+    return store.columns(), reader.errors, reader.derived, reader.records
+
+class JsonlEventReader:
+    """Streams events out of JSON Lines, one object with the CSV's fields per line.
+
+    Dates may be 'DD-MM-YYYY HH:MM' as in the CSV or ISO 8601 without a UTC
+    offset (events have naive local times). name and date are required, the
+    other fields default to '' and a missing id to a new one. Records that
+    cannot be parsed are skipped and counted in `errors`.
+    """
+
+    def __init__(self):
+        self.errors = 0
+
+    def read(self, lines):
+        for line in lines:
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+                text = record['date']
+                try:
+                    date = parse_event_date(text)
+                except ValueError:
+                    date = datetime.fromisoformat(text)
+                    if date.tzinfo is not None:
+                        raise ValueError('date with a UTC offset: %r' % text)
+                yield Event(str(record['name']), date, str(record.get('comments') or ''),
+                            str(record.get('category') or ''), str(record.get('notifications') or ''),
+                            str(record.get('id') or '') or new_event_id())
+            except (ValueError, KeyError, TypeError, AttributeError):
+                self.errors += 1
+
+def file_format(file):
+    """Return 'jsonl' or 'csv' for a filename or open file, going by its extension."""
+    name = file if isinstance(file, (str, os.PathLike)) else getattr(file, 'name', '')
+    return 'jsonl' if os.path.splitext(str(name))[1].lower() in ('.jsonl', '.ndjson') else 'csv'
+
+EPOCH = datetime(1970, 1, 1)
+MINUTE = timedelta(minutes=1)
+
+# Names, comments and categories repeat a lot, so their words are cached
+@functools.lru_cache(maxsize=65536)
+def tokenize(text):
+    """Split text into the lowercase words used by the search index."""
+    return tuple(re.findall(r'\w+', text.lower()))
+
+@functools.lru_cache(maxsize=65536)
+def _terms(name, comments, category):
+    return frozenset(tokenize(name) + tokenize(comments) + tokenize(category))
+
+def event_terms(event):
+    """Return the set of words the search index files an event under."""
+    return _terms(event.name, event.comments, event.category)
+
+def matches_words(event, words):
+    """Check that every word is the start of a word in the event's name, comments or category."""
+    terms = event_terms(event)
+    return all(any(term.startswith(word) for term in terms) for word in words)
+
+def to_minutes(date):
+    """Return a date as whole minutes since the epoch (the resolution of the CSV format)."""
+    return (date - EPOCH) // MINUTE
+
+def minute_bound(date):
+    # Rounded up, so that comparing whole minutes against it matches comparing the datetimes
+    return -((EPOCH - date) // MINUTE)
+
+class EventStore:
+    """Memory-compact columnar container for events.
+
+    Dates are kept as epoch minutes in an int64 array (minute resolution, the
+    same as the CSV format) and categories/notifications as integer codes into
+    a table of distinct values. Event objects are only built when an item is
+    accessed. Supports the list operations EventManager uses (len, indexing,
+    iteration, append, pop) plus batched range queries over the columns.
+    """
+
+    def __init__(self, events=()):
+        self._names = []
+        self._comments = []
+        self._minutes = array('q')
+        self._categories = array('i')
+        self._notifications = array('i')
+        self._values = []
+        self._codes = {}
+        self._ids = []
+        for event in events:
+            self.append(event)
+
+    def _encode(self, value):
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self._values)
+            self._values.append(value)
+        return code
+
+    def _event(self, index):
+        return Event(self._names[index], EPOCH + self._minutes[index] * MINUTE, self._comments[index],
+                     self._values[self._categories[index]], self._values[self._notifications[index]],
+                     self._ids[index])
+
+    def __len__(self):
+        return len(self._minutes)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._event(position) for position in range(*index.indices(len(self)))]
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError('event index out of range')
+        return self._event(index)
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self._event(index)
+
+    def append(self, event):
+        self._names.append(event.name)
+        self._comments.append(event.comments)
+        self._minutes.append(to_minutes(event.date))
+        self._categories.append(self._encode(event.category))
+        self._notifications.append(self._encode(event.notifications))
+        self._ids.append(event.id)
+
+    def extend(self, events):
+        for event in events:
+            self.append(event)
+
+    def columns(self):
+        """Return (names, comments, minutes, categories, notifications, values, ids) for extend_columns()."""
+        return (self._names, self._comments, self._minutes, self._categories, self._notifications, self._values,
+                self._ids)
+
+    def extend_columns(self, columns):
+        """Append the events of another store's columns() without building Event objects."""
+        names, comments, minutes, categories, notifications, values, ids = columns
+        codes = [self._encode(value) for value in values]
+        self._names += names
+        self._comments += comments
+        self._minutes += minutes
+        self._categories += array('i', map(codes.__getitem__, categories))
+        self._notifications += array('i', map(codes.__getitem__, notifications))
+        self._ids += ids
+
+    @staticmethod
+    def events_from_columns(columns):
+        """Build the Event objects for another store's columns()."""
+        names, comments, minutes, categories, notifications, values, ids = columns
+        dates = map(EPOCH.__add__, map(MINUTE.__mul__, minutes))
+        return list(map(Event, names, dates, comments, map(values.__getitem__, categories),
+                        map(values.__getitem__, notifications), ids))
+
+    def pop(self, index=-1):
+        event = self[index]
+        for column in (self._names, self._comments, self._minutes, self._categories, self._notifications,
+                       self._ids):
+            del column[index]
+        return event
+
+    def taken_ids(self, ids):
+        """Return the IDs among ids that events here already have."""
+        return set(ids).intersection(self._ids)
+
+    def get_id(self, event_id):
+        """Return the event with an ID, or None."""
+        try:
+            return self._event(self._ids.index(event_id))
+        except ValueError:
+            return None
+
+    def pop_id(self, event_id):
+        """Remove the event with an ID and return it, or None if there is none."""
+        try:
+            return self.pop(self._ids.index(event_id))
+        except ValueError:
+            return None
+
+    def pop_many(self, indices):
+        """Remove the events at several (non-negative) positions and return them."""
+        # From the back, so the positions still to go do not shift
+        return [self.pop(index) for index in sorted(set(indices), reverse=True) if index < len(self)]
+
+    def _positions(self, start, end, category=None):
+        low, high = minute_bound(start), minute_bound(end)
+        positions = [index for index, minute in enumerate(self._minutes) if low <= minute < high]
+        if category:
+            # The category match runs once per distinct value, not once per event
+            category = category.lower()
+            codes = {code for code, value in enumerate(self._values) if category in value.lower()}
+            positions = [index for index in positions if self._categories[index] in codes]
+        return positions
+
+    def between(self, start, end, category=None):
+        """Return the events with start <= date < end, ordered by date, optionally matching a category."""
+        positions = self._positions(start, end, category)
+        positions.sort(key=self._minutes.__getitem__)
+        return [self._event(index) for index in positions]
+
+    def count_by_day(self):
+        """Return {day: {category: count}} computed in one pass over the date and category columns."""
+        counts = {}
+        for minute, code in zip(self._minutes, self._categories):
+            key = (minute // 1440, code)
+            counts[key] = counts.get(key, 0) + 1
+        days = {}
+        for (day, code), count in counts.items():
+            days.setdefault((EPOCH + timedelta(days=day)).date(), {})[self._values[code]] = count
+        return days
+
+class SqliteStorage:
+    """Event storage in a local SQLite database (WAL mode) with indexes on date and category.
+
+    Like EventStore it supports the list operations EventManager uses, but every
+    mutation is its own transaction and range queries and counts run as SQL,
+    so the events never have to be held in memory. Positions follow insertion order.
+    """
+
+    def __init__(self, filename='events.db'):
+        self.filename = filename
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(filename, check_same_thread=False, isolation_level=None)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute('PRAGMA synchronous=NORMAL')
+        self._connection.executescript('''
+            CREATE TABLE IF NOT EXISTS events (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                date INTEGER NOT NULL,  -- minutes since 1970-01-01
+                comments TEXT NOT NULL,
+                category TEXT NOT NULL,
+                notifications TEXT NOT NULL,
+                uid TEXT  -- the Event ID, unlike id stable across databases and exports
+            );
+            CREATE INDEX IF NOT EXISTS events_date ON events (date);
+            CREATE INDEX IF NOT EXISTS events_category ON events (category, date);
+        ''')
+        with self._connection:
+            # Databases created before events had IDs get the column, and every row an ID
+            if 'uid' not in [row[1] for row in self._connection.execute('PRAGMA table_info(events)')]:
+                self._connection.execute('ALTER TABLE events ADD COLUMN uid TEXT')
+            self._connection.execute('CREATE UNIQUE INDEX IF NOT EXISTS events_uid ON events (uid)')
+            self._connection.execute('UPDATE events SET uid = lower(hex(randomblob(8))) WHERE uid IS NULL')
+
+    def close(self):
+        self._connection.close()
+
+    def _query(self, sql, parameters=()):
+        with self._lock:
+            return self._connection.execute(sql, parameters).fetchall()
+
+    @staticmethod
+    def _event(row):
+        return Event(row[0], EPOCH + row[1] * MINUTE, row[2], row[3], row[4], row[5])
+
+    @staticmethod
+    def _row(event):
+        return (event.name, to_minutes(event.date), event.comments, event.category, event.notifications,
+                event.id or new_event_id())
+
+    def __len__(self):
+        return self._query('SELECT COUNT(*) FROM events')[0][0]
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            rows = self._query('SELECT name, date, comments, category, notifications, uid FROM events '
+                               'ORDER BY id LIMIT ? OFFSET ?', (max(stop - start, 0), start))
+            return [self._event(row) for row in rows[::step]]
+        if index < 0:
+            index += len(self)
+        rows = self._query('SELECT name, date, comments, category, notifications, uid FROM events '
+                           'ORDER BY id LIMIT 1 OFFSET ?', (index,)) if index >= 0 else []
+        if not rows:
+            raise IndexError('event index out of range')
+        return self._event(rows[0])
+
+    def __iter__(self):
+        return self.iter_events()
+
+    def iter_events(self, start=None, end=None, category=None):
+        """Yield the events with start <= date < end (either bound optional) in insertion order.
+
+        Rows are read in pages, so iterating a large table does not hold it all in memory.
+        """
+        sql = 'SELECT id, name, date, comments, category, notifications, uid FROM events WHERE id > ?'
+        parameters = []
+        if start is not None:
+            sql += ' AND date >= ?'
+            parameters.append(minute_bound(start))
+        if end is not None:
+            sql += ' AND date < ?'
+            parameters.append(minute_bound(end))
+        if category:
+            condition, values = self._category_filter(category)
+            sql += condition
+            parameters += values
+        last_id = 0
+        while True:
+            rows = self._query(sql + ' ORDER BY id LIMIT 1000', [last_id] + parameters)
+            if not rows:
+                return
+            for row in rows:
+                yield self._event(row[1:])
+            last_id = rows[-1][0]
+
+    def append(self, event):
+        self.extend([event])
+
+    def extend(self, events):
+        """Insert many events in a single transaction."""
+        with self._lock:
+            with self._connection:
+                self._connection.execute('BEGIN')
+                self._connection.executemany(
+                    'INSERT INTO events (name, date, comments, category, notifications, uid) '
+                    'VALUES (?, ?, ?, ?, ?, ?)',
+                    map(self._row, events))
+
+    def pop(self, index=-1):
+        event = self[index]
+        if index < 0:
+            index += len(self)
+        with self._lock:
+            self._connection.execute(
+                'DELETE FROM events WHERE id = (SELECT id FROM events ORDER BY id LIMIT 1 OFFSET ?)', (index,))
+        return event
+
+    def pop_many(self, indices):
+        """Remove the events at several (non-negative) positions in a single transaction and return them."""
+        with self._lock:
+            with self._connection:
+                self._connection.execute('BEGIN')
+                # Every position refers to the table before the delete, so all ids are looked up first
+                rows = [self._connection.execute('SELECT id, name, date, comments, category, notifications, uid '
+                                                 'FROM events ORDER BY id LIMIT 1 OFFSET ?', (index,)).fetchone()
+                        for index in indices]
+                rows = [row for row in rows if row is not None]
+                self._connection.executemany('DELETE FROM events WHERE id = ?', [(row[0],) for row in rows])
+        return [self._event(row[1:]) for row in rows]
+
+    def taken_ids(self, ids):
+        """Return the IDs among ids that events here already have."""
+        ids = list(ids)
+        taken = set()
+        # In batches, as SQLite limits the number of parameters of a statement
+        for offset in range(0, len(ids), 500):
+            batch = ids[offset:offset + 500]
+            taken.update(row[0] for row in self._query(
+                'SELECT uid FROM events WHERE uid IN (%s)' % ','.join('?' * len(batch)), batch))
+        return taken
+
+    def get_id(self, event_id):
+        """Return the event with an ID, or None."""
+        rows = self._query('SELECT name, date, comments, category, notifications, uid FROM events WHERE uid = ?',
+                           (event_id,))
+        return self._event(rows[0]) if rows else None
+
+    def pop_id(self, event_id):
+        """Remove the event with an ID and return it, or None if there is none."""
+        with self._lock:
+            with self._connection:
+                self._connection.execute('BEGIN')
+                row = self._connection.execute('SELECT name, date, comments, category, notifications, uid '
+                                               'FROM events WHERE uid = ?', (event_id,)).fetchone()
+                self._connection.execute('DELETE FROM events WHERE uid = ?', (event_id,))
+        return self._event(row) if row else None
+
+    def _category_filter(self, category):
+        # The substring match runs over the distinct categories, then the category index does the rest
+        category = category.lower()
+        values = [row[0] for row in self._query('SELECT DISTINCT category FROM events')
+                  if category in row[0].lower()]
+        return ' AND category IN (%s)' % ', '.join('?' * len(values)), values
+
+    def between(self, start, end, category=None):
+        """Return the events with start <= date < end, ordered by date, optionally matching a category."""
+        sql = 'SELECT name, date, comments, category, notifications, uid FROM events WHERE date >= ? AND date < ?'
+        parameters = [minute_bound(start), minute_bound(end)]
+        if category:
+            condition, values = self._category_filter(category)
+            sql += condition
+            parameters += values
+        rows = self._query(sql + ' ORDER BY date, id', parameters)
+        return [self._event(row) for row in rows]
+
+    def count_between(self, start, end):
+        """Count events per category with start <= date < end."""
+        rows = self._query('SELECT category, COUNT(*) FROM events WHERE date >= ? AND date < ? GROUP BY category',
+                           (minute_bound(start), minute_bound(end)))
+        return dict(rows)
+
+class CsvFileStorage:
+    """Event storage that streams the CSV file instead of loading it.
+
+    Queries read the file in large chunks and drop non-matching rows before
+    building Event objects, so memory stays constant however large the file is.
+    Adding an event appends one row; removing one rewrites the file as a stream.
+    """
+
+    buffer_size = 1 << 20
+
+    def __init__(self, filename='events.csv'):
+        self.filename = filename
+
+    def iter_events(self, start=None, end=None, category=None):
+        """Yield the events with start <= date < end (either bound optional) in file order."""
+        try:
+            with open(self.filename, mode='r', newline='', buffering=self.buffer_size) as file:
+                yield from CsvEventReader().read(file, start, end, category)
+        except FileNotFoundError:
+            return
+
+    def __iter__(self):
+        return self.iter_events()
+
+    def __len__(self):
+        return sum(1 for _ in self.iter_events())
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return list(itertools.islice(self.iter_events(), *index.indices(len(self))))
+        if index < 0:
+            index += len(self)
+        for event in itertools.islice(self.iter_events(), max(index, 0), None) if index >= 0 else ():
+            return event
+        raise IndexError('event index out of range')
+
+    def append(self, event):
+        self.extend([event])
+
+    def extend(self, events):
+        try:
+            with open(self.filename, mode='r', newline='') as file:
+                header = next(csv.reader(file), None)
+        except FileNotFoundError:
+            header = None
+        if header is not None and 'id' not in header:
+            # A file from before IDs is rewritten once, with the IDs its rows are read with, so that
+            # neither the IDs given out here nor the ones derived for the old rows change afterwards
+            temporary = self.filename + '.tmp'
+            with open(temporary, mode='w', newline='') as file:
+                writer = csv.DictWriter(file, fieldnames=FIELDNAMES)
+                writer.writeheader()
+                writer.writerows(event.to_dict() for event in self.iter_events())
+                self._write_rows(writer, events)
+            os.replace(temporary, self.filename)
+            return
+        with open(self.filename, mode='a', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=header or FIELDNAMES)
+            if header is None:
+                writer.writeheader()
+            self._write_rows(writer, events)
+
+    @staticmethod
+    def _write_rows(writer, events):
+        for event in events:
+            if event.id is None:
+                event.id = new_event_id()
+            writer.writerow(event.to_dict())
+
+    def pop(self, index=-1):
+        if index < 0:
+            index += len(self)
+        popped = self.pop_many([index])
+        if not popped:
+            raise IndexError('event index out of range')
+        return popped[0]
+
+    def pop_many(self, indices):
+        """Remove the events at several (non-negative) positions with one pass over the file and return them."""
+        indices = set(indices)
+        popped = []
+        temporary = self.filename + '.tmp'
+        with open(temporary, mode='w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=FIELDNAMES)
+            writer.writeheader()
+            for position, event in enumerate(self.iter_events()):
+                if position in indices:
+                    popped.append(event)
+                else:
+                    writer.writerow(event.to_dict())
+        if not popped:
+            os.remove(temporary)
+            return popped
+        os.replace(temporary, self.filename)
+        return popped
+
+    def taken_ids(self, ids):
+        """Return the IDs among ids that events here already have (one pass over the file)."""
+        ids = set(ids)
+        return {event.id for event in self.iter_events() if event.id in ids}
+
+    def get_id(self, event_id):
+        """Return the event with an ID, or None."""
+        return next((event for event in self.iter_events() if event.id == event_id), None)
+
+    def pop_id(self, event_id):
+        """Remove the event with an ID and return it, or None if there is none."""
+        for position, event in enumerate(self.iter_events()):
+            if event.id == event_id:
+                return self.pop_many([position])[0]
+        return None
+
+    def between(self, start, end, category=None):
+        """Return the events with start <= date < end, ordered by date, optionally matching a category."""
+        return sorted(self.iter_events(start, end, category), key=lambda event: event.date)
+
+    def count_between(self, start, end):
+        """Count events per category with start <= date < end."""
+        summary = {}
+        for event in self.iter_events(start, end):
+            summary[event.category] = summary.get(event.category, 0) + 1
+        return summary
+
+class MappedEventStore:
+    """Read-only events in a memory-mapped binary snapshot of an events CSV.
+
+    Opening one parses nothing: the columns are used in place through memory
+    views, so range and count queries answer right away. The file holds a
+    versioned header, then int64 epoch-minute dates in file order, the
+    positions sorted by date (with the sorted dates, for bisecting) and, for
+    each text field, int32 codes into a string table (int64 offsets plus the
+    UTF-8 bytes); the event IDs are the fifth text field. The header records
+    the (mtime, size) of the CSV it was built from, so a snapshot of an older
+    CSV is never used.
+    """
+
+    magic = b'TODOSNAP'
+    version = 2
+    # magic, version, byte order, source mtime_ns, source size, events, skipped rows
+    header = struct.Struct('<8sII4q')
+    # minutes, sorted positions, sorted minutes, then codes and table offsets/bytes for each text field
+    sections = 3 + 3 * 5
+    directory = struct.Struct('<%dq' % (2 * sections))
+
+    def __init__(self, filename, source):
+        """Map a snapshot file; raises ValueError unless it is a current snapshot of source, a (mtime_ns, size) pair."""
+        self.filename = filename
+        with open(filename, 'rb') as file:
+            self._mapping = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._views = []
+        try:
+            magic, version, byteorder, mtime_ns, size, count, errors = self.header.unpack_from(self._mapping)
+            if (magic != self.magic or version != self.version or byteorder != (sys.byteorder == 'little')
+                    or (mtime_ns, size) != tuple(source)):
+                raise ValueError('%s is not a current snapshot' % filename)
+            self.errors = errors
+            bounds = self.directory.unpack_from(self._mapping, self.header.size)
+            columns = [self._view(bounds[2 * idx], bounds[2 * idx + 1], idx) for idx in range(self.sections)]
+        except (ValueError, struct.error, TypeError):
+            self.close()
+            raise ValueError('%s is not a current snapshot' % filename)
+        self._count = count
+        self._minutes, self._order, self._sorted_minutes = columns[:3]
+        self._codes = columns[3::3]
+        self._tables = list(zip(columns[4::3], columns[5::3]))
+        # There are few distinct categories, so their table is decoded once
+        self._category_values = self._table(2)
+
+    def _view(self, offset, length, section):
+        if offset < 0 or length < 0 or offset + length > len(self._mapping):
+            raise ValueError('section out of bounds')
+        view = memoryview(self._mapping)[offset:offset + length]
+        self._views.append(view)
+        # Dates and positions are int64, codes int32, offsets int64; string bytes stay raw
+        kind = 'q' if section < 3 else ('i', 'q', None)[(section - 3) % 3]
+        if kind is not None:
+            view = view.cast(kind)
+            self._views.append(view)
+        return view
+
+    def close(self):
+        # The views hold exported buffers of the mapping, which must go before it can close
+        for view in reversed(self._views):
+            view.release()
+        self._views = []
+        self._mapping.close()
+
+    def _value(self, field, code):
+        offsets, data = self._tables[field]
+        return str(data[offsets[code]:offsets[code + 1]], 'utf-8')
+
+    def _table(self, field):
+        offsets, data = self._tables[field]
+        return [str(data[offsets[code]:offsets[code + 1]], 'utf-8') for code in range(len(offsets) - 1)]
+
+    def _event(self, index):
+        codes = self._codes
+        return Event(self._value(0, codes[0][index]), EPOCH + self._minutes[index] * MINUTE,
+                     self._value(1, codes[1][index]), self._category_values[codes[2][index]],
+                     self._value(3, codes[3][index]), self._value(4, codes[4][index]) or None)
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self._event(idx) for idx in range(*index.indices(self._count))]
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError('event index out of range')
+        return self._event(index)
+
+    def __iter__(self):
+        return map(self._event, range(self._count))
+
+    def get_id(self, event_id):
+        """Return the event with an ID, or None (a scan of the ID table)."""
+        code = next((code for code in range(len(self._tables[4][0]) - 1) if self._value(4, code) == event_id), None)
+        return None if code is None else self._event(self._codes[4].tolist().index(code))
+
+    def _positions(self, start, end, category=None):
+        # The dates are bisected in place, so a range costs O(log N) plus its size
+        low = bisect.bisect_left(self._sorted_minutes, minute_bound(start))
+        high = bisect.bisect_left(self._sorted_minutes, minute_bound(end))
+        positions = self._order[low:high]
+        if category:
+            category = category.lower()
+            codes = {code for code, value in enumerate(self._category_values) if category in value.lower()}
+            category_codes = self._codes[2]
+            return [index for index in positions if category_codes[index] in codes]
+        return positions
+
+    def between(self, start, end, category=None):
+        """Return the events with start <= date < end, ordered by date, optionally matching a category."""
+        return [self._event(index) for index in self._positions(start, end, category)]
+
+    def iter_events(self, start=None, end=None, category=None):
+        """Yield the events with start <= date < end (either bound optional), ordered by date."""
+        positions = self._positions(start or datetime.min, end or datetime.max, category)
+        return map(self._event, positions)
+
+    def count_between(self, start, end):
+        """Count events per category with start <= date < end."""
+        counts = Counter(map(self._codes[2].__getitem__, self._positions(start, end)))
+        return {self._category_values[code]: count for code, count in counts.items()}
+
+    @classmethod
+    def open(cls, filename, source):
+        """Return the snapshot in filename if it is current for source, else None."""
+        if source is None:
+            return None
+        try:
+            return cls(filename, source)
+        except (OSError, ValueError):
+            return None
+
+    @classmethod
+    def write(cls, filename, events, source, errors=0):
+        """Write a snapshot of events, built from a CSV with the (mtime_ns, size) source, atomically to filename."""
+        minutes = array('q')
+        codes = [array('i') for _ in range(5)]
+        tables = [{} for _ in range(5)]
+        for event in events:
+            minutes.append(to_minutes(event.date))
+            for column, table, value in zip(codes, tables, (event.name, event.comments, event.category,
+                                                            event.notifications, event.id or '')):
+                code = table.get(value)
+                if code is None:
+                    code = table[value] = len(table)
+                column.append(code)
+        order = array('q', sorted(range(len(minutes)), key=minutes.__getitem__))
+        sections = [minutes, order, array('q', map(minutes.__getitem__, order))]
+        for column, table in zip(codes, tables):
+            data = [value.encode('utf-8') for value in table]
+            offsets = array('q', itertools.accumulate(map(len, data), initial=0))
+            sections += [column, offsets, b''.join(data)]
+        blobs = [section if isinstance(section, bytes) else section.tobytes() for section in sections]
+
+        directory = []
+        offset = cls.header.size + cls.directory.size
+        for blob in blobs:
+            offset += -offset % 8  # keeps every column aligned for the memory views
+            directory += [offset, len(blob)]
+            offset += len(blob)
+        descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(filename)),
+                                                 prefix=os.path.basename(filename), suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, mode='wb') as file:
+                file.write(cls.header.pack(cls.magic, cls.version, sys.byteorder == 'little', source[0], source[1],
+                                           len(minutes), errors))
+                file.write(cls.directory.pack(*directory))
+                for blob, position in zip(blobs, directory[::2]):
+                    file.write(b'\0' * (position - file.tell()))
+                    file.write(blob)
+            os.replace(temporary, filename)
+        except BaseException:
+            os.remove(temporary)
+            raise
+
+class EventArchive:
+    """Past events in compressed, time-partitioned segments: one gzip CSV per month.
+
+    EventManager moves events older than its horizon (see archive_after) here
+    when it saves. A segment is only read when a query's date range reaches
+    its month, and at most max_loaded segments stay in memory, so memory does
+    not grow with the history. Segments are kept in date order and are
+    replaced in one step when they change. Next to each segment a small
+    sidecar holds the sorted 64-bit hashes of its IDs, so finding an ID (or
+    that it is not archived) reads no segment it is not in.
+    """
+
+    suffix = '.csv.gz'
+    # Sidecar header: the (mtime_ns, size) of the segment its hashes belong to
+    ids_header = struct.Struct('<qq')
+
+    def __init__(self, directory, max_loaded=12, compresslevel=6):
+        self.directory = directory
+        self.max_loaded = max_loaded
+        self.compresslevel = compresslevel
+        self._lock = threading.RLock()
+        # month -> ((mtime, size), dates, events), least recently used first
+        self._segments = OrderedDict()
+        # month -> (segment signature, sorted ID hashes); 8 bytes per archived event
+        self._ids = {}
+        self._months = None
+
+    def segment_filename(self, month):
+        return os.path.join(self.directory, '%04d-%02d%s' % (month[0], month[1], self.suffix))
+
+    def ids_filename(self, month):
+        return os.path.join(self.directory, '%04d-%02d.ids' % month)
+
+    @staticmethod
+    def _id_key(event_id):
+        return int.from_bytes(hashlib.blake2b(event_id.encode('utf-8'), digest_size=8).digest(), 'little')
+
+    def _id_keys(self, month):
+        # The sorted ID hashes of a segment, from its sidecar while that still matches the segment
+        try:
+            stat = os.stat(self.segment_filename(month))
+        except FileNotFoundError:
+            return array('Q')
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = self._ids.get(month)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+        keys = None
+        try:
+            with open(self.ids_filename(month), 'rb') as file:
+                data = file.read()
+            if len(data) >= self.ids_header.size and self.ids_header.unpack_from(data) == signature:
+                keys = array('Q')
+                keys.frombytes(data[self.ids_header.size:])
+                if sys.byteorder == 'big':
+                    keys.byteswap()
+        except FileNotFoundError:
+            pass
+        if keys is None:
+            # E.g. a crash between writing a segment and its sidecar
+            keys = self._write_ids(month, self._load(month)[1], signature)
+        self._ids[month] = (signature, keys)
+        return keys
+
+    def _write_ids(self, month, events, signature):
+        keys = array('Q', sorted(self._id_key(event.id) for event in events))
+        data = array('Q', keys)
+        if sys.byteorder == 'big':
+            data.byteswap()
+        temporary = self.ids_filename(month) + '.tmp'
+        with open(temporary, 'wb') as file:
+            file.write(self.ids_header.pack(*signature))
+            file.write(data.tobytes())
+        os.replace(temporary, self.ids_filename(month))
+        self._ids[month] = (signature, keys)
+        return keys
+
+    def months(self):
+        """Return the (year, month) of every segment, oldest first."""
+        try:
+            signature = os.stat(self.directory).st_mtime_ns
+        except FileNotFoundError:
+            return []
+        # The listing is cached until a segment is added or removed, which changes the directory
+        with self._lock:
+            if self._months is None or self._months[0] != signature:
+                pattern = re.compile(r'(\d{4})-(\d{2})' + re.escape(self.suffix))
+                months = [match.groups() for match in map(pattern.fullmatch, os.listdir(self.directory)) if match]
+                self._months = (signature, sorted((int(year), int(month)) for year, month in months))
+            return self._months[1]
+
+    def _months_between(self, start, end):
+        first, last = (start.year, start.month), (end.year, end.month)
+        return [month for month in self.months() if first <= month <= last]
+
+    def _load(self, month):
+        # Returns (dates, events) of a segment, from memory while the file is unchanged
+        filename = self.segment_filename(month)
+        try:
+            stat = os.stat(filename)
+        except FileNotFoundError:
+            self._segments.pop(month, None)
+            return [], []
+        signature = (stat.st_mtime_ns, stat.st_size)
+        cached = self._segments.get(month)
+        if cached is None or cached[0] != signature:
+            with gzip.open(filename, mode='rt', newline='', encoding='utf-8') as file:
+                events = sorted(CsvEventReader().read(file), key=lambda event: event.date)
+            cached = self._segments[month] = (signature, [event.date for event in events], events)
+        self._segments.move_to_end(month)
+        while len(self._segments) > self.max_loaded:
+            self._segments.popitem(last=False)
+        return cached[1], cached[2]
+
+    def _write(self, month, events):
+        filename = self.segment_filename(month)
+        if not events:
+            os.remove(filename)
+            with suppress(FileNotFoundError):
+                os.remove(self.ids_filename(month))
+            self._segments.pop(month, None)
+            self._ids.pop(month, None)
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        descriptor, temporary = tempfile.mkstemp(dir=self.directory, prefix=os.path.basename(filename),
+                                                 suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, mode='wb') as raw:
+                with gzip.open(raw, mode='wt', newline='', encoding='utf-8',
+                               compresslevel=self.compresslevel) as file:
+                    writer = csv.writer(file)
+                    writer.writerow(FIELDNAMES)
+                    # Plain rows and %-formatting (twice as fast as strftime) rather than
+                    # to_dict(): a first archive run can write millions of events
+                    writer.writerows((event.name, '%02d-%02d-%04d %02d:%02d' % (
+                                          event.date.day, event.date.month, event.date.year, event.date.hour,
+                                          event.date.minute),
+                                      event.comments, event.category, event.notifications, event.id)
+                                     for event in events)
+                raw.flush()
+                os.fsync(raw.fileno())
+            os.replace(temporary, filename)
+        except BaseException:
+            os.remove(temporary)
+            raise
+        stat = os.stat(filename)
+        self._segments[month] = ((stat.st_mtime_ns, stat.st_size), [event.date for event in events], events)
+        self._segments.move_to_end(month)
+        self._write_ids(month, events, (stat.st_mtime_ns, stat.st_size))
+
+    def add(self, events):
+        """Merge events into the segments of their months; events whose ID a segment already holds are skipped."""
+        by_month = {}
+        for event in events:
+            by_month.setdefault((event.date.year, event.date.month), []).append(event)
+        with self._lock:
+            for month, added in sorted(by_month.items()):
+                existing = self._load(month)[1]
+                ids = {event.id for event in existing}
+                added = sorted((event for event in added if event.id not in ids), key=lambda event: event.date)
+                if added:
+                    self._write(month, list(heapq.merge(existing, added, key=lambda event: event.date)))
+
+    def between(self, start, end, category=None):
+        """Return the archived events with start <= date < end, ordered by date, optionally matching a category."""
+        return list(self.iter_events(start, end, category))
+
+    def month(self, month):
+        """Return the archived events of a (year, month), ordered by date."""
+        with self._lock:
+            return list(self._load(month)[1])
+
+    def month_counts(self):
+        """Return the number of archived events per (year, month), counted from the ID sidecars."""
+        with self._lock:
+            return {month: len(self._id_keys(month)) for month in self.months()}
+
+    def iter_events(self, start=None, end=None, category=None):
+        """Yield the archived events with start <= date < end (either bound optional) in date order.
+
+        Segments are read one at a time, so this runs in the memory of a few months.
+        """
+        start, end = start or datetime.min, end or datetime.max
+        category = category.lower() if category else None
+        for month in self._months_between(start, end):
+            with self._lock:
+                dates, events = self._load(month)
+                events = events[bisect.bisect_left(dates, start):bisect.bisect_left(dates, end)]
+            if category is not None:
+                events = [event for event in events if category in event.category.lower()]
+            yield from events
+
+    def count_between(self, start, end):
+        """Count archived events per category with start <= date < end."""
+        summary = {}
+        for event in self.iter_events(start, end):
+            summary[event.category] = summary.get(event.category, 0) + 1
+        return summary
+
+    def get_id(self, event_id):
+        """Return the archived event with an ID, or None; only a segment whose sidecar has the ID's hash is read."""
+        key = self._id_key(event_id)
+        with self._lock:
+            for month in reversed(self.months()):
+                keys = self._id_keys(month)
+                position = bisect.bisect_left(keys, key)
+                if position < len(keys) and keys[position] == key:
+                    event = next((event for event in self._load(month)[1] if event.id == event_id), None)
+                    if event is not None:
+                        return event
+        return None
+
+    def pop_id(self, event_id):
+        """Remove the archived event with an ID, rewriting its segment, and return it, or None if there is none."""
+        with self._lock:
+            event = self.get_id(event_id)
+            if event is not None:
+                month = (event.date.year, event.date.month)
+                self._write(month, [candidate for candidate in self._load(month)[1] if candidate is not event])
+        return event
+
+def migrate_csv_to_sqlite(csv_filename='events.csv', db_filename='events.db'):
+    """Copy the events of a CSV file and its archive into a (new or empty) SQLite database and return its storage."""
+    storage = SqliteStorage(db_filename)
+    if len(storage) == 0:
+        # iter_events() merges in the archived events, a month at a time
+        storage.extend(EventManager(csv_filename, columnar=True).iter_events())
+    return storage
+
+class EventManager:
+    # The least CSV data worth handing to a load worker of its own
+    parallel_chunk_bytes = 16 << 20
+
+    def __init__(self, filename='events.csv', journaled=False, compact_threshold=1000, columnar=False,
+                 storage=None, atomic=False, write_behind=False, flush_interval=0.5, mapped=False, parallel=False,
+                 archive_after=None):
+        self.filename = filename
+        # A storage backend such as SqliteStorage persists every mutation itself and
+        # answers range queries and counts directly; the CSV file is then not used
+        self.storage = storage
+        # Keep the events in an EventStore instead of a list of Event objects
+        self.columnar = columnar
+        # In journaled mode mutations are appended to a log next to the CSV
+        # snapshot instead of rewriting the whole file on every change.
+        self.journaled = journaled
+        self.journal_filename = filename + '.journal'
+        self.compact_threshold = compact_threshold
+        self.journal_size = 0
+        # In atomic mode saves hold an inter-process lock, merge in changes other
+        # processes saved in the meantime and replace the file in one step, so
+        # concurrent writers lose no updates and readers never see a partial file.
+        self.atomic = atomic
+        self.lock_filename = filename + '.lock'
+        # In write-behind mode a background thread saves at most flush_interval
+        # seconds after a change, coalescing every change made in between.
+        self.write_behind = write_behind
+        self.flush_interval = flush_interval
+        # The error of the last failed write-behind save, until a save succeeds
+        self.save_error = None
+        # In mapped mode a binary snapshot of the CSV (see MappedEventStore) is kept
+        # next to it; while it is current, loading maps it instead of parsing the CSV
+        # and the events stay read-only in place until the first change.
+        self.mapped = mapped
+        self.mapped_filename = filename + '.snap'
+        # With parallel set (True for one worker per CPU, or a worker count) a
+        # large CSV is parsed in chunks by a process pool; smaller files, with
+        # less than parallel_chunk_bytes per worker, are still read serially.
+        self.parallel = parallel
+        # With archive_after set (a number of days), saving moves the events older
+        # than that into compressed monthly segments (see EventArchive), so the
+        # file only holds the recent events; queries read the segments they reach.
+        # An existing archive is read even without archive_after, so every tool sees the whole history.
+        if archive_after is not None and storage is not None:
+            raise ValueError('archive_after needs events loaded from a CSV file, not a storage backend')
+        self.archive_after = archive_after
+        self.archive_directory = filename + '.archive'
+        self.archive = None
+        if archive_after is not None or storage is None and os.path.isdir(self.archive_directory):
+            self.archive = EventArchive(self.archive_directory)
+        # Guards the events and indexes when one manager is shared between Streamlit sessions
+        self._lock = threading.RLock()
+        self._wake = threading.Condition(self._lock)
+        self._writer = None
+        self._closed = False
+        self._dirty_since = None
+        # Changes not saved yet, re-applied if another process saved the file first
+        # (journaled changes are already on disk, so they are not tracked here)
+        self._pending = []
+        # Called as listener(action, events) after every add/remove, see add_listener()
+        self._listeners = []
+        self.events = self.load_events()
+        self.build_indexes()
+        if self.archive_after is not None and self._loaded_between(datetime.min, self.archive_cutoff()):
+            self.save_events()  # e.g. a file from before tiering, or events that aged past the horizon
+
+    @property
+    def events(self):
+        """The events by position: a list of Events, or a container with the same operations."""
+        # Events removed by ID stay behind as tombstones until the events are next used by position
+        if self._tombstones:
+            self._compact()
+        return self._events
+
+    @events.setter
+    def events(self, events):
+        self._events = events
+        self._tombstones = set()
+
+    def _compact(self):
+        with self._lock:
+            dead, self._tombstones = self._tombstones, set()
+            if dead:
+                self._events[:] = [event for event in self._events if event.id not in dead]
+                self._index_events = [event for event in self._index_events if event.id not in dead]
+                self._index_dates = [event.date for event in self._index_events]
+
+    def file_signature(self):
+        """Return the (mtime, size) of the backing files, used to notice changes made by other writers."""
+        signature = []
+        for filename in (self.filename, self.journal_filename) if self.journaled else (self.filename,):
+            try:
+                stat = os.stat(filename)
+                signature.append((stat.st_mtime_ns, stat.st_size))
+            except OSError:
+                signature.append(None)
+        return tuple(signature)
+
+    def is_stale(self):
+        """Check whether the backing files changed since this manager last read or wrote them."""
+        if self.storage is not None:
+            return False  # every query goes to the storage, so there is nothing cached to go stale
+        return self.file_signature() != self.loaded_signature
+
+    @timed('EventManager.load_events')
+    def load_events(self):
+        self.load_errors = 0
+        if self.storage is not None:
+            return self.storage
+        # Taken before reading, so a write racing with the load shows up as stale later
+        self.loaded_signature = self.file_signature()
+        events = MappedEventStore.open(self.mapped_filename, self.loaded_signature[0]) if self.mapped else None
+        if events is not None:
+            self.load_errors = events.errors
+        else:
+            events = self._read_csv()
+            if self.mapped and self.loaded_signature[0] is not None:
+                # The CSV is new or changed since the binary snapshot was built, so it is rebuilt
+                MappedEventStore.write(self.mapped_filename, events, self.loaded_signature[0], self.load_errors)
+        if self.journaled:
+            journal = self.loaded_signature[1]
+            if journal is not None and journal[1]:
+                events = self._thawed(events)
+            self.journal_size = self.replay_journal(events)
+        return events
+
+    def _read_csv(self):
+        events = EventStore() if self.columnar else []
+        # Loaded events hold no reference cycles, so collector passes over a
+        # million fresh objects would only slow the load down
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            workers = self._load_workers()
+            if workers > 1:
+                from concurrent.futures.process import BrokenProcessPool
+                try:
+                    self.load_errors = self._read_csv_parallel(events, workers)
+                    return events
+                except (OSError, BrokenProcessPool):
+                    # E.g. no processes can be started here; the serial load below still works
+                    events = EventStore() if self.columnar else []
+            reader = CsvEventReader()
+            try:
+                with open(self.filename, mode='r', newline='') as file:
+                    events.extend(reader.read(file))
+            except FileNotFoundError:
+                pass
+            self.load_errors = reader.errors
+        finally:
+            if gc_enabled:
+                gc.enable()
+        return events
+
+    def _load_workers(self):
+        # One worker per parallel_chunk_bytes of file, up to the CPU count (or the number asked for)
+        if not self.parallel:
+            return 1
+        try:
+            size = os.path.getsize(self.filename)
+        except OSError:
+            return 1
+        limit = (os.cpu_count() or 1) if self.parallel is True else self.parallel
+        return max(1, min(limit, size // self.parallel_chunk_bytes))
+
+    def _read_csv_parallel(self, events, workers):
+        from concurrent.futures import ProcessPoolExecutor
+        # A few chunks per worker even out the load when some parse slower than others
+        header, chunks = split_csv(self.filename, workers * 4)
+        if not chunks:
+            return 0
+        errors = 0
+        # Each worker numbers the records of its chunk from 1 (see CsvEventReader), so the
+        # rows without an ID are numbered again with the records of the chunks before
+        records = 0
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # map() yields the chunks in file order, so the events keep their positions
+            for columns, chunk_errors, derived, chunk_records in pool.map(
+                    read_csv_chunk, itertools.repeat(self.filename), itertools.repeat(header), *zip(*chunks)):
+                ids = columns[6]
+                for position, fields_hash, record in derived:
+                    ids[position] = numbered_event_id(fields_hash, records + record)
+                records += chunk_records
+                if self.columnar:
+                    events.extend_columns(columns)
+                else:
+                    events.extend(EventStore.events_from_columns(columns))
+                errors += chunk_errors
+        return errors
+
+    def _thawed(self, events):
+        # A mapped snapshot is read-only, so changes go to a copy in the regular in-memory container
+        if isinstance(events, MappedEventStore):
+            return EventStore(events) if self.columnar else list(events)
+        return events
+
+    def _make_writable(self):
+        if isinstance(self._events, MappedEventStore):
+            self.events = self._thawed(self._events)
+            self.build_indexes()
+
+    def replay_journal(self, events):
+        """Apply the add/remove/delete records of the journal to the events loaded from the snapshot."""
+        records = 0
+        deleted = set()
+        try:
+            with open(self.journal_filename, mode='r', newline='') as file:
+                for row in csv.reader(file):
+                    # A torn last line (crash while appending) is ignored
+                    if row and row[0] == 'add' and len(row) in (6, 7):
+                        date = parse_event_date(row[2])
+                        events.append(Event(row[1], date, row[3], row[4], row[5],
+                                            row[6] if len(row) == 7 else new_event_id()))
+                    elif row and row[0] == 'remove' and len(row) == 2:
+                        # Positions were taken with the earlier deletes by ID applied
+                        self._drop_ids(events, deleted)
+                        index = int(row[1])
+                        if 0 <= index < len(events):
+                            events.pop(index)
+                    elif row and row[0] == 'delete' and len(row) == 2:
+                        deleted.add(row[1])
+                    else:
+                        continue
+                    records += 1
+        except FileNotFoundError:
+            pass
+        self._drop_ids(events, deleted)
+        return records
+
+    @staticmethod
+    def _drop_ids(events, ids):
+        # Removes the events with the given IDs in one pass and empties ids
+        if not ids:
+            return
+        if isinstance(events, list):
+            events[:] = [event for event in events if event.id not in ids]
+        else:
+            events.pop_many([position for position, event in enumerate(events) if event.id in ids])
+        ids.clear()
+
+    def append_journal(self, records):
+        """Append mutation records to the journal in one write and compact it once it grows past the threshold."""
+        with file_lock(self.lock_filename) if self.atomic else nullcontext():
+            # Changes another writer made since the load must still show as stale to the next compaction,
+            # which reloads the snapshot and journal (these records included) before writing
+            stale = self.is_stale()
+            with open(self.journal_filename, mode='a', newline='') as file:
+                csv.writer(file).writerows(records)
+            self.journal_size += len(records)
+            compact = self.journal_size >= self.compact_threshold
+            if not compact and not stale:
+                self.loaded_signature = self.file_signature()
+        # Outside the lock, which save_events() takes again
+        if compact:
+            self.save_events()
+
+    @timed('EventManager.save_events')
+    def save_events(self):
+        if self.storage is not None:
+            return  # the storage already committed every change
+        with self._lock:
+            if self.atomic:
+                with file_lock(self.lock_filename):
+                    if self.is_stale():
+                        self._merge_saved_changes()
+                    self._write_saved()
+            else:
+                self._write_saved()
+            self._pending = []
+            self._dirty_since = None
+            self.save_error = None
+
+    def _write_saved(self):
+        # All of this runs under the file lock when atomic: another writer must not
+        # replay journal records the new snapshot already holds, nor append one that is then truncated
+        self._archive_events()
+        self._write_snapshot()
+        self._write_mapped()
+        if self.journaled:
+            # The snapshot now holds every journaled change, so the log starts over
+            open(self.journal_filename, mode='w').close()
+            self.journal_size = 0
+        self.loaded_signature = self.file_signature()
+
+    def archive_cutoff(self):
+        """Return the date before which events belong in the archive, or None without archive_after."""
+        if self.archive_after is None:
+            return None
+        return datetime.combine(datetime.now().date() - timedelta(days=self.archive_after), datetime.min.time())
+
+    def _archive_events(self):
+        # The segments are written before the file, so a crash in between leaves
+        # events in both, which the next save drops again (segments skip IDs they hold)
+        if self.archive_after is None:
+            return
+        old = self._loaded_between(datetime.min, self.archive_cutoff())
+        if not old:
+            return
+        self.archive.add(old)
+        ids = {event.id for event in old}
+        self._make_writable()
+        if isinstance(self.events, list):
+            self.events[:] = [event for event in self.events if event.id not in ids]
+        else:
+            self.events.pop_many([position for position, event in enumerate(self.events) if event.id in ids])
+        self.build_indexes()
+
+    def _write_snapshot(self):
+        if not self.atomic:
+            with open(self.filename, mode='w', newline='') as file:
+                self._write_rows(file)
+            return
+        # Written next to the target and moved over it, so readers see either the old or the new file
+        descriptor, temporary = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(self.filename)),
+                                                 prefix=os.path.basename(self.filename), suffix='.tmp')
+        try:
+            with os.fdopen(descriptor, mode='w', newline='') as file:
+                self._write_rows(file)
+                file.flush()
+                os.fsync(file.fileno())
+            os.replace(temporary, self.filename)
+        except BaseException:
+            os.remove(temporary)
+            raise
+
+    def _write_mapped(self):
+        if self.mapped:
+            MappedEventStore.write(self.mapped_filename, self.events, self.file_signature()[0])
+
+    def _write_rows(self, file):
+        writer = csv.DictWriter(file, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        for event in self.events:
+            writer.writerow(event.to_dict())
+
+    def _merge_saved_changes(self):
+        """Reload the file another process saved and re-apply the changes this manager has not saved yet."""
+        events = self._thawed(self.load_events())
+        for action, event in self._pending:
+            if action == 'add':
+                events.append(event)
+                continue
+            position = next((index for index, candidate in enumerate(events) if candidate.id == event.id), None)
+            if position is None:
+                # Rows saved before events had IDs are matched by their fields too, in case their IDs differ
+                fields = Event(event.name, event.date, event.comments, event.category, event.notifications).to_dict()
+                position = next((index for index, candidate in enumerate(events)
+                                 if candidate.to_dict() == dict(fields, id=candidate.id)), None)
+            if position is not None:
+                events.pop(position)
+        self.events = events
+        self.build_indexes()
+
+    def _changed(self, changes):
+        # Called with the lock held after every change (or batch of changes) to the loaded events
+        self._pending.extend(changes)
+        # A closed manager (e.g. evicted from a cache while a session still holds it) saves directly
+        if not self.write_behind or self._closed:
+            self.save_events()
+            return
+        if self._dirty_since is None:
+            self._dirty_since = time.monotonic()
+        if self._writer is None:
+            self._writer = threading.Thread(target=self._write_behind_loop, name='event-writer', daemon=True)
+            self._writer.start()
+            atexit.register(self.flush)
+        self._wake.notify()
+
+    def _write_behind_loop(self):
+        with self._lock:
+            while not self._closed:
+                if self._dirty_since is None:
+                    self._wake.wait()
+                    continue
+                remaining = self._dirty_since + self.flush_interval - time.monotonic()
+                if remaining > 0:
+                    self._wake.wait(remaining)
+                    continue
+                try:
+                    self.save_events()
+                except Exception as error:
+                    # E.g. a full disk: the changes stay pending and the save is retried, instead of the thread dying
+                    logging.getLogger(__name__).exception('Saving %s failed, retrying', self.filename)
+                    self.save_error = error
+                    self._wake.wait(self.flush_interval)
+
+    def flush(self):
+        """Save any changes the write-behind thread has not saved yet."""
+        with self._lock:
+            if self._dirty_since is not None:
+                self.save_events()
+
+    def close(self):
+        """Flush pending changes and stop the write-behind thread."""
+        self.flush()
+        with self._lock:
+            self._closed = True
+            self._wake.notify()
+        if self._writer is not None:
+            self._writer.join()
+            atexit.unregister(self.flush)
+
+    def build_indexes(self):
+        """Rebuild the date-ordered index and the per-day category counts from the loaded events.
+
+        The search index is left to the first search (see _search_index()).
+        """
+        # Word -> events containing it, category -> number of events and ID -> event, for the list-backed mode only
+        self._terms = self._categories = self._by_id = None
+        # The days with events, in order; built by the first count over whole days
+        self._days = None
+        if self.storage is not None:
+            self._index_dates = self._index_events = self._day_counts = None
+            return
+        if isinstance(self.events, MappedEventStore):
+            # The snapshot answers range queries and counts in place
+            self._index_dates = self._index_events = self._day_counts = None
+            return
+        if self.columnar:
+            # The store answers range queries itself with a pass over its date column
+            self._index_dates = self._index_events = None
+            self._day_counts = self.events.count_by_day()
+            return
+        ordered = sorted(self.events, key=lambda event: event.date)
+        self._index_dates = [event.date for event in ordered]
+        self._index_events = ordered
+        self._day_counts = {}
+        self._sorted_terms = None
+        self._categories = {}
+        self._by_id = {event.id: event for event in ordered}
+        # As in load_events, the index entries hold no reference cycles
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            # The events are in date order, so each day's counts are one run of the list
+            for day, events in itertools.groupby(ordered, key=lambda event: event.date.date()):
+                self._day_counts[day] = dict(Counter(event.category for event in events))
+            self._categories = dict(Counter(event.category for event in ordered))
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    def _build_terms(self):
+        # The postings cost more than the rest of build_indexes() and most loads never search
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            postings = {}
+            for event in self._index_events:
+                if event.id not in self._tombstones:
+                    for term in event_terms(event):
+                        postings.setdefault(term, []).append(event)
+            self._terms = {term: set(events) for term, events in postings.items()}
+            self._sorted_terms = None
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    def _count(self, event, delta):
+        date = event.date.date()
+        day = self._day_counts.get(date)
+        if day is None:
+            day = self._day_counts[date] = {}
+            if self._days is not None:
+                bisect.insort(self._days, date)
+        day[event.category] = day.get(event.category, 0) + delta
+        if day[event.category] == 0:
+            del day[event.category]
+            if not day:
+                del self._day_counts[date]
+                if self._days is not None:
+                    del self._days[bisect.bisect_left(self._days, date)]
+
+    def _index_terms(self, event, delta):
+        count = self._categories.get(event.category, 0) + delta
+        if count:
+            self._categories[event.category] = count
+        else:
+            del self._categories[event.category]
+        if self._terms is None:
+            return  # not built yet, see _build_terms()
+        for term in event_terms(event):
+            if delta > 0:
+                if term not in self._terms:
+                    self._terms[term] = set()
+                    self._sorted_terms = None
+                self._terms[term].add(event)
+            else:
+                self._terms[term].discard(event)
+                if not self._terms[term]:
+                    del self._terms[term]
+                    self._sorted_terms = None
+
+    def _index_add(self, event):
+        if self._index_dates is not None:
+            position = bisect.bisect_right(self._index_dates, event.date)
+            self._index_dates.insert(position, event.date)
+            self._index_events.insert(position, event)
+            self._index_terms(event, 1)
+        self._count(event, 1)
+
+    def _index_add_many(self, events):
+        if self._index_dates is not None and len(events) > 16:
+            # One linear merge instead of a list insert (and memmove) per event;
+            # heapq.merge keeps existing events first among equal dates, as bisect_right does
+            added = sorted(events, key=lambda event: event.date)
+            self._index_events = list(heapq.merge(self._index_events, added, key=lambda event: event.date))
+            self._index_dates = [event.date for event in self._index_events]
+            for event in added:
+                self._index_terms(event, 1)
+                self._count(event, 1)
+            return
+        for event in events:
+            self._index_add(event)
+
+    def _index_remove_many(self, events):
+        if self._index_dates is not None and len(events) > 16:
+            removed = {id(event) for event in events}
+            self._index_events = [event for event in self._index_events if id(event) not in removed]
+            self._index_dates = [event.date for event in self._index_events]
+            for event in events:
+                self._index_terms(event, -1)
+                self._count(event, -1)
+            return
+        for event in events:
+            self._index_remove(event)
+
+    def _index_remove(self, event):
+        if self._index_dates is None:
+            self._count(event, -1)
+            return
+        low = bisect.bisect_left(self._index_dates, event.date)
+        high = bisect.bisect_right(self._index_dates, event.date)
+        for position in range(low, high):
+            if self._index_events[position] is event:
+                del self._index_dates[position]
+                del self._index_events[position]
+                self._count(event, -1)
+                self._index_terms(event, -1)
+                break
+
+    @timed('EventManager.search')
+    def search(self, query, start=None, end=None):
+        """Return the events whose name, comments or category has a word starting with each word of query.
+
+        Optionally limited to start <= date < end; ordered by date. The list-backed
+        mode answers from an inverted index; other containers are scanned, as are
+        the archive segments the range reaches (all of them without a start).
+        """
+        tokens = set(tokenize(query))
+        if not tokens:
+            return []
+        with self._lock:
+            if self._index_dates is None:
+                return sorted((event for event in self.iter_events(start, end) if matches_words(event, tokens)),
+                              key=lambda event: event.date)
+        events = self._search_index(tokens, start, end)
+        if self.archive is not None:
+            archived = [event for event in self.archive.iter_events(start, end) if matches_words(event, tokens)]
+            events = list(heapq.merge(archived, events, key=lambda event: event.date))
+        return events
+
+    def _search_index(self, tokens, start=None, end=None):
+        # The loaded events matching every token, from the inverted index, in date order
+        with self._lock:
+            if self._terms is None:
+                self._build_terms()
+            if self._sorted_terms is None:
+                self._sorted_terms = sorted(self._terms)
+            matches = None
+            # Longer words are usually rarer, so the candidate set shrinks fastest that way
+            for token in sorted(tokens, key=len, reverse=True):
+                found = set()
+                position = bisect.bisect_left(self._sorted_terms, token)
+                while position < len(self._sorted_terms) and self._sorted_terms[position].startswith(token):
+                    found.update(self._terms[self._sorted_terms[position]])
+                    position += 1
+                matches = found if matches is None else matches & found
+                if not matches:
+                    return []
+        events = [event for event in matches
+                  if (start is None or event.date >= start) and (end is None or event.date < end)]
+        events.sort(key=lambda event: event.date)
+        return events
+
+    @timed('EventManager.events_between')
+    def events_between(self, start, end, category=None):
+        """Return the events with start <= date < end, ordered by date, optionally matching a category.
+
+        Archived events are included; only the segments the range reaches are read.
+        """
+        events = self._loaded_between(start, end, category)
+        if self.archive is not None:
+            archived = self.archive.between(start, end, category)
+            if archived:
+                events = list(heapq.merge(archived, events, key=lambda event: event.date))
+        return events
+
+    def _loaded_between(self, start, end, category=None):
+        with self._lock:
+            if self._index_dates is None:
+                return self.events.between(start, end, category)
+            low = bisect.bisect_left(self._index_dates, start)
+            high = bisect.bisect_left(self._index_dates, end)
+            events = self._index_events[low:high]
+            if self._tombstones:
+                events = [event for event in events if event.id not in self._tombstones]
+            if category:
+                # The substring match runs over the distinct categories instead of every event
+                category = category.lower()
+                matching = {value for value in self._categories if category in value.lower()}
+                events = [event for event in events if event.category in matching]
+        return events
+
+    def iter_events(self, start=None, end=None, category=None):
+        """Yield the events with start <= date < end (either bound optional), optionally matching a category.
+
+        With a streaming storage (CsvFileStorage, SqliteStorage) this runs in
+        constant memory; loaded events come out in date order.
+        """
+        if self.storage is not None:
+            return self.storage.iter_events(start, end, category)
+        events = self._loaded_between(start or datetime.min, end or datetime.max, category)
+        if self.archive is not None:
+            # A segment at a time, so going through the whole history does not load it all at once
+            return heapq.merge(self.archive.iter_events(start, end, category), events, key=lambda event: event.date)
+        return iter(events)
+
+    def page_events(self, page=0, page_size=50, search='', sort_by='date', descending=False):
+        """Return (total, rows) for one page of the events, rows being (index, event) pairs.
+
+        Searching (see search()), sorting and paging happen here, so a view only
+        has to format the rows of the page it shows. Archived events are paged
+        too, with None for index: in date order without a search only the
+        segments of the months the page shows are read, the others are counted
+        from their ID sidecars; a search or another order reads every segment.
+        """
+        with self._lock:
+            rows = list(enumerate(self.events))
+        if self.archive is not None and (search or sort_by != 'date'):
+            rows += [(None, event) for event in self.archive.iter_events()]
+        if search:
+            with self._lock:
+                matches = self._matching(search, [event for idx, event in rows])
+            rows = [row for row in rows if row[1] in matches]
+        if self.archive is not None and not search and sort_by == 'date':
+            return self._page_by_month(rows, page, page_size, descending)
+        rows.sort(key=lambda row: getattr(row[1], sort_by), reverse=descending)
+        return len(rows), rows[page * page_size:(page + 1) * page_size]
+
+    def _page_by_month(self, rows, page, page_size, descending):
+        # One page in date order of the loaded rows and the archive, month by month; whole months
+        # before the page are skipped by their counts, so only the segments the page shows are read
+        loaded = {}
+        for row in rows:
+            loaded.setdefault((row[1].date.year, row[1].date.month), []).append(row)
+        counts = self.archive.month_counts()
+        total = len(rows) + sum(counts.values())
+        first = page * page_size
+        page_rows = []
+        skipped = 0
+        for month in sorted(loaded.keys() | counts.keys(), reverse=descending):
+            if len(page_rows) >= page_size:
+                break
+            size = len(loaded.get(month, ())) + counts.get(month, 0)
+            if skipped + size <= first:
+                skipped += size
+                continue
+            month_rows = loaded.get(month, []) + [(None, event) for event in self.archive.month(month)]
+            month_rows.sort(key=lambda row: row[1].date, reverse=descending)
+            page_rows.extend(month_rows[max(first - skipped, 0):])
+            skipped += len(month_rows)
+        return total, page_rows[:page_size]
+
+    @timed('EventManager.add_event')
+    def add_event(self, name, date, comments, category, notifications):
+        self.add_events([Event(name, date, comments, category, notifications)])
+
+    @timed('EventManager.add_events')
+    def add_events(self, events):
+        """Add many events and persist them with a single save, journal write or transaction.
+
+        Returns the number of events added.
+        """
+        events = list(events)
+        if not events:
+            return 0
+        # Checked before anything changes, so a bad event leaves the manager as it was
+        for event in events:
+            if not isinstance(event.date, datetime) or event.date.tzinfo is not None:
+                raise ValueError('event %r needs a datetime without a UTC offset, not %r' % (event.name, event.date))
+        with self._lock:
+            self._make_writable()
+            # Other containers are asked once for the whole batch
+            taken = None if self._by_id is not None else self._events.taken_ids(
+                {event.id for event in events if event.id is not None})
+            batch = set()
+            for event in events:
+                # An ID is kept (e.g. from an import) unless it is missing or already taken
+                if event.id is None or event.id in batch or (
+                        event.id in taken if taken is not None
+                        else event.id in self._by_id or event.id in self._tombstones):
+                    event.id = new_event_id()
+                batch.add(event.id)
+                if self._by_id is not None:
+                    self._by_id[event.id] = event
+            self._events.extend(events)
+            if self.storage is None:
+                self._index_add_many(events)
+                if self.journaled:
+                    rows = [event.to_dict() for event in events]
+                    self.append_journal([['add'] + [row[field] for field in FIELDNAMES] for row in rows])
+                else:
+                    self._changed([('add', event) for event in events])
+            self._notify_listeners('add', events)
+        return len(events)
+
+    @timed('EventManager.remove_event')
+    def remove_event(self, index):
+        """Method to remove an event by its index."""
+        self.remove_events([index])
+
+    @timed('EventManager.remove_events')
+    def remove_events(self, indices):
+        """Remove the events at several indexes and persist that with a single save, journal write or transaction.
+
+        Indexes refer to the events before the removal; out-of-range ones are
+        ignored. Returns the removed events.
+        """
+        with self._lock:
+            # From the back, so the positions still to go do not shift
+            indices = sorted({index for index in indices if 0 <= index < len(self.events)}, reverse=True)
+            if not indices:
+                return []
+            self._make_writable()
+            if isinstance(self.events, list):
+                removed = [self.events.pop(index) for index in indices]
+            else:
+                removed = self.events.pop_many(indices)
+            if self._by_id is not None:
+                for event in removed:
+                    self._by_id.pop(event.id, None)
+            if self.storage is None:
+                self._index_remove_many(removed)
+                if self.journaled:
+                    self.append_journal([['remove', index] for index in indices])
+                else:
+                    self._changed([('remove', event) for event in removed])
+            self._notify_listeners('remove', removed)
+        return removed
+
+    @timed('EventManager.remove_event_by_id')
+    def remove_event_by_id(self, event_id):
+        """Remove the event with an ID and return it, or None if there is none.
+
+        Unlike a position, an ID stays valid while other sessions change the
+        events. With loaded events the removal only leaves a tombstone, in O(1);
+        the event lists are compacted when next used by position.
+        """
+        with self._lock:
+            self._make_writable()
+            if self._by_id is not None:
+                event = self._by_id.pop(event_id, None)
+                if event is None:
+                    return self._remove_archived(event_id)
+                self._tombstones.add(event_id)
+                self._count(event, -1)
+                self._index_terms(event, -1)
+                if len(self._tombstones) > len(self._events) // 4 + 1024:
+                    self._compact()  # bounds the memory held by tombstones
+            else:
+                event = self._events.pop_id(event_id)
+                if event is None:
+                    return self._remove_archived(event_id)
+                if self.storage is None:
+                    self._index_remove(event)
+            if self.storage is None:
+                if self.journaled:
+                    self.append_journal([['delete', event_id]])
+                else:
+                    self._changed([('remove', event)])
+            self._notify_listeners('remove', [event])
+        return event
+
+    def _remove_archived(self, event_id):
+        # An archived event is removed from its segment right away, under the lock saves take
+        if self.archive is None:
+            return None
+        with file_lock(self.lock_filename) if self.atomic else nullcontext():
+            event = self.archive.pop_id(event_id)
+        if event is not None:
+            self._notify_listeners('remove', [event])
+        return event
+
+    def get_event(self, event_id):
+        """Return the event with an ID, or None; archived events are looked up in their segments."""
+        with self._lock:
+            if self._by_id is not None:
+                event = self._by_id.get(event_id)
+            else:
+                event = self._events.get_id(event_id)
+        if event is None and self.archive is not None:
+            event = self.archive.get_id(event_id)
+        return event
+
+    def add_listener(self, listener):
+        """Call listener('add' or 'remove', events) after every change made through this manager.
+
+        Listeners run with the manager's lock held, so they must be quick and
+        must not wait for other threads that use the manager.
+        """
+        with self._lock:
+            self._listeners.append(listener)
+
+    def remove_listener(self, listener):
+        with self._lock:
+            self._listeners.remove(listener)
+
+    def _notify_listeners(self, action, events):
+        for listener in self._listeners:
+            listener(action, events)
+
+    @timed('EventManager.import_events')
+    def import_events(self, source, format=None):
+        """Add the events of a CSV or JSON Lines file (a filename or an open text file) with a single commit.
+
+        The format defaults to the one the file extension suggests. Records are
+        parsed as a stream; invalid ones are skipped. Returns (added, skipped).
+        """
+        format = format or file_format(source)
+        reader = JsonlEventReader() if format == 'jsonl' else CsvEventReader()
+        if isinstance(source, (str, os.PathLike)):
+            with open(source, mode='r', newline='', encoding='utf-8') as file:
+                added = self.add_events(reader.read(file))
+        else:
+            added = self.add_events(reader.read(source))
+        return added, reader.errors
+
+    @timed('EventManager.export_events')
+    def export_events(self, target, format=None, start=None, end=None, category=None):
+        """Write the events (optionally only start <= date < end and matching a category) as CSV or JSON Lines.
+
+        target is a filename or an open text file; the events are streamed out
+        one at a time. Returns the number of events written.
+        """
+        format = format or file_format(target)
+        if isinstance(target, (str, os.PathLike)):
+            with open(target, mode='w', newline='', encoding='utf-8') as file:
+                return self.export_events(file, format, start, end, category)
+        written = 0
+        if format == 'jsonl':
+            for event in self.iter_events(start, end, category):
+                target.write(json.dumps(event.to_dict()) + '\n')
+                written += 1
+            return written
+        writer = csv.DictWriter(target, fieldnames=FIELDNAMES)
+        writer.writeheader()
+        for event in self.iter_events(start, end, category):
+            writer.writerow(event.to_dict())
+            written += 1
+        return written
+
+    @timed('EventManager.filter_events')
+    def filter_events(self, timeframe="today", category="", keywords=""):
+        now = datetime.now()
+
+        if timeframe == "today":
+            start = now.replace(hour=0, minute=0, second=0, microsecond=0)
+            end = start + timedelta(days=1)
+        elif timeframe == "this_week":
+            start = now - timedelta(days=now.weekday())  # Start of this week (Monday)
+            end = start + timedelta(weeks=1)
+        elif timeframe == "this_month":
+            start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+            end = (start.replace(month=start.month % 12 + 1, day=1) if start.month < 12 else start.replace(month=1, year=start.year+1))
+
+        # Filter events based on category and timeframe
+        events = self.events_between(start, end, category)
+        if keywords:
+            matches = self._matching(keywords, events, start, end)
+            events = [event for event in events if event in matches]
+        return events
+
+    def _matching(self, query, candidates, start=None, end=None):
+        # The set of events among candidates that match a search query
+        words = set(tokenize(query))
+        if self._index_dates is not None:
+            if not words:
+                return set()
+            matches = set(self._search_index(words, start, end))
+            if self.archive is not None:
+                # Archived candidates are not in the index, so those are checked directly
+                matches.update(event for event in candidates
+                               if event.id not in self._by_id and matches_words(event, words))
+            return matches
+        # Containers without the index build new Event objects on access, so the candidates are checked directly
+        return {event for event in candidates if matches_words(event, words)}
+
+    @timed('EventManager.count_between')
+    def count_between(self, start, end):
+        """Count events per category with start <= date < end.
+
+        Whole days are read from the per-day aggregates of the days with events;
+        only the partial days at either edge of the range go through the date
+        index. Archived events are counted from the segments the range reaches.
+        """
+        summary = self._count_loaded(start, end)
+        if self.archive is not None:
+            for category, count in self.archive.count_between(start, end).items():
+                summary[category] = summary.get(category, 0) + count
+        return summary
+
+    def _count_loaded(self, start, end):
+        if self._day_counts is None:
+            return self.events.count_between(start, end)
+        summary = {}
+        if start >= end:
+            return summary
+        with self._lock:
+            if self._days is None:
+                self._days = sorted(self._day_counts)
+            cursor = start
+            first_day = start.date()
+            if start.time() != datetime.min.time():
+                # A partial first day; the last day of the calendar has no next one
+                first_day = first_day + timedelta(days=1) if first_day < datetime.max.date() else None
+                cursor = min(datetime.combine(first_day, datetime.min.time()), end) if first_day else end
+                self._add_counts(summary, self._loaded_between(start, cursor))
+            if first_day is not None and first_day < end.date():
+                # Only the populated days in between are visited, found by bisecting
+                days = self._days
+                for day in days[bisect.bisect_left(days, first_day):bisect.bisect_left(days, end.date())]:
+                    for category, count in self._day_counts[day].items():
+                        summary[category] = summary.get(category, 0) + count
+                cursor = datetime.combine(end.date(), datetime.min.time())
+            if cursor < end:
+                self._add_counts(summary, self._loaded_between(cursor, end))
+        return summary
+
+    @staticmethod
+    def _add_counts(summary, events):
+        for event in events:
+            summary[event.category] = summary.get(event.category, 0) + 1
+
+    def _summary_window(self, timeframe, now):
+        # Define the time range based on the selected timeframe
+        if timeframe == "today":
+            start_time = now.replace(hour=0, minute=0, second=0, microsecond=0)
+            end_time = now.replace(hour=23, minute=59, second=59, microsecond=999999)
+        elif timeframe == "this_week":
+            start_time = now - timedelta(days=now.weekday())  # Start of this week (Monday)
+            end_time = start_time + timedelta(days=6, hours=23, minutes=59, seconds=59)
+        elif timeframe == "this_month":
+            start_time = datetime(now.year, now.month, 1)  # First day of this month
+            end_time = datetime(now.year, now.month, 1) + timedelta(days=31)  # Rough end of the month
+            end_time = end_time.replace(hour=23, minute=59, second=59, microsecond=999999)
+
+        # count_between takes an exclusive end
+        return start_time, end_time + timedelta(microseconds=1)
+
+    @timed('EventManager.summarize_events')
+    def summarize_events(self, timeframe):
+        return self.count_between(*self._summary_window(timeframe, datetime.now()))
+
+    def summarize_timeframes(self, timeframes=("today", "this_week", "this_month")):
+        """Summarize several timeframes at once, e.g. for a dashboard showing today/week/month together."""
+        now = datetime.now()
+        return {timeframe: self.count_between(*self._summary_window(timeframe, now)) for timeframe in timeframes}
+
+class EventManagerCache:
+    """Process-wide cache of EventManagers keyed by filename.
+
+    A cached manager is reused until its backing file changes on disk (another
+    process or another manager wrote to it); then it is reloaded on the next lookup.
+    With max_entries set, the least recently used managers are closed and dropped.
+    """
+
+    def __init__(self, max_entries=None):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._managers = OrderedDict()
+
+    def get(self, filename='events.csv', **options):
+        with self._lock:
+            manager = self._managers.get(filename)
+            if manager is None or manager.is_stale():
+                if manager is not None:
+                    manager.close()  # saves (and merges) anything still waiting to be written
+                manager = EventManager(filename, **options)
+                self._managers[filename] = manager
+            self._managers.move_to_end(filename)
+            while self.max_entries is not None and len(self._managers) > self.max_entries:
+                self._managers.popitem(last=False)[1].close()
+            return manager
+
+class EventShards:
+    """Per-user event files, listed in a small JSON manifest.
+
+    Each user's events live in their own CSV shard that is only loaded when
+    that user needs it, and at most max_loaded shards stay in memory, so a
+    request only pays for one user's events. An events file from before
+    shards is handed to one user with migrate(). Extra keyword arguments are
+    passed on to each shard's EventManager.
+    """
+
+    def __init__(self, directory='event_shards', max_loaded=16, **options):
+        self.directory = directory
+        self.manifest_filename = os.path.join(directory, 'manifest.json')
+        self.options = options
+        self._managers = EventManagerCache(max_entries=max_loaded)
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+        self._shards = self._read_manifest()
+
+    def _read_manifest(self):
+        try:
+            with open(self.manifest_filename) as file:
+                return json.load(file)['shards']
+        except FileNotFoundError:
+            return {}
+
+    def users(self):
+        with self._lock:
+            return sorted(self._shards)
+
+    def shard_filename(self, user):
+        """Return the shard file of a user, registering a new shard in the manifest if needed."""
+        with self._lock:
+            if user not in self._shards:
+                with file_lock(self.manifest_filename + '.lock'):
+                    # Another process may have registered shards since the manifest was read
+                    self._shards = self._read_manifest()
+                    if user not in self._shards:
+                        slug = re.sub(r'[^A-Za-z0-9_-]+', '_', user)[:40]
+                        digest = hashlib.sha1(user.encode('utf-8')).hexdigest()[:10]
+                        self._shards[user] = f'{slug}-{digest}.csv'
+                        temporary = self.manifest_filename + '.tmp'
+                        with open(temporary, 'w') as file:
+                            json.dump({'version': 1, 'shards': self._shards}, file, indent=2, sort_keys=True)
+                        os.replace(temporary, self.manifest_filename)
+            return os.path.join(self.directory, self._shards[user])
+
+    def manager(self, user):
+        """Return the EventManager of a user's shard."""
+        return self._managers.get(self.shard_filename(user), **self.options)
+
+    def migrate(self, user, filename):
+        """Copy an events file, with its journal and archive, into a user's shard and return the shard file.
+
+        A one-time step for the events.csv everyone shared before shards; raises
+        FileExistsError once the user's shard has a file of its own.
+        """
+        shard = self.shard_filename(user)
+        with file_lock(self.manifest_filename + '.lock'):
+            if os.path.exists(shard):
+                raise FileExistsError(f'{user} already has a shard: {shard}')
+            if os.path.isdir(filename + '.archive'):
+                shutil.copytree(filename + '.archive', shard + '.archive', dirs_exist_ok=True)
+            if os.path.exists(filename + '.journal'):
+                shutil.copyfile(filename + '.journal', shard + '.journal')
+            # The events file goes last and in one step, so a shard file only exists once it is complete
+            shutil.copyfile(filename, shard + '.tmp')
+            os.replace(shard + '.tmp', shard)
+        return shard
+
+class LogFileSink:
+    """Notification sink that appends one line per reminder to a log file."""
+
+    def __init__(self, filename='notifications.log'):
+        self.filename = filename
+        self._lock = threading.Lock()
+
+    def __call__(self, event):
+        line = (f"{datetime.now():%d-%m-%Y %H:%M:%S} reminder: {event.name} at {event.date:%d-%m-%Y %H:%M} "
+                f"[{event.category}] {event.comments}\n")
+        with self._lock:
+            with open(self.filename, mode='a', encoding='utf-8') as file:
+                file.write(line)
+
+class SmtpSink:
+    """Notification sink that sends each reminder as an email through an SMTP server.
+
+    The default server is one on localhost, such as a development stand-in
+    started with `python -m aiosmtpd -n -l localhost:8025` (then port=8025).
+    """
+
+    def __init__(self, recipient, sender='todo@localhost', host='localhost', port=25, timeout=10):
+        self.recipient = recipient
+        self.sender = sender
+        self.host = host
+        self.port = port
+        self.timeout = timeout
+
+    def __call__(self, event):
+        # smtplib and email cost more to import than the rest of this module; only mail senders pay for them
+        import smtplib
+        from email.message import EmailMessage
+        message = EmailMessage()
+        message['From'] = self.sender
+        message['To'] = self.recipient
+        message['Subject'] = f"Reminder: {event.name} at {event.date:%d-%m-%Y %H:%M}"
+        message.set_content(f"{event.name}\n{event.date:%d-%m-%Y %H:%M}\nCategory: {event.category}\n\n"
+                            f"{event.comments}\n")
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            smtp.send_message(message)
+
+class NotificationDispatcher:
+    """Sends reminders for the events of an EventManager through pluggable sinks.
+
+    sinks maps a notifications value (case-insensitive, e.g. 'email') to a sink,
+    any callable taking the event; events with other values get no reminder. A
+    reminder is due lead before its event. Pending reminders wait in a heap keyed
+    by due time that only covers the next `horizon` and is refilled from the
+    manager's date index as time passes, so memory is bounded by the reminders
+    due within the horizon and each one costs O(log N) to schedule and send.
+    Events added or removed through the manager update the heap right away.
+    Sinks run on a small thread pool, so a slow one does not hold up the schedule.
+
+    With a state file, the time up to which every reminder was sent is saved
+    after each batch, and after a restart the reminders due since then are
+    sent straight away. A batch cut short by a crash is sent again. A reminder
+    a sink fails to send is tried again after retry_delay, and the saved time
+    stays before it until it goes out, so reminders are sent at least once.
+    """
+
+    # The smallest step between datetimes, to turn due-time bounds into date ranges
+    resolution = timedelta(microseconds=1)
+    # Reminders per job handed to the thread pool
+    batch_size = 100
+    retry_delay = timedelta(minutes=1)
+
+    def __init__(self, manager, sinks, lead=timedelta(0), horizon=timedelta(days=1), state_filename=None,
+                 workers=4, start=None):
+        """start is the time from which reminders are due (default: the saved state, or now)."""
+        self.manager = manager
+        self.sinks = {key.lower(): sink for key, sink in sinks.items()}
+        self.lead = lead
+        self.horizon = horizon
+        self.state_filename = state_filename
+        self.sent = self.failed = 0
+        # Shares the manager's lock, so the heap always matches the manager's events
+        self._lock = manager._lock
+        self._wake = threading.Condition(self._lock)
+        self._heap = []
+        self._sequence = itertools.count()
+        # IDs of removed events whose reminders are still in the heap, skipped when they come up
+        self._cancelled = Counter()
+        # ID -> due time of the reminders that failed and wait for another try
+        self._retries = {}
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='event-notifier')
+        self._thread = None
+        self._closed = False
+        with self._lock:
+            # Every reminder due up to the watermark has been sent; the heap holds those due up to _horizon_end
+            self._watermark = self._horizon_end = start or self._load_watermark() or datetime.now()
+            self._fill(self._watermark + horizon)
+            manager.add_listener(self._changed)
+
+    def __len__(self):
+        return len(self._heap)
+
+    @staticmethod
+    def _key(event):
+        return event.id
+
+    def _sink(self, event):
+        return self.sinks.get(event.notifications.strip().lower())
+
+    def _fill(self, until):
+        # Schedules the reminders due in (_horizon_end, until]
+        if until <= self._horizon_end:
+            return
+        for event in self.manager.events_between(self._horizon_end + self.lead + self.resolution,
+                                                 until + self.lead + self.resolution):
+            if self._sink(event) is not None:
+                heapq.heappush(self._heap, (event.date - self.lead, next(self._sequence), event))
+        self._horizon_end = until
+
+    def _changed(self, action, events):
+        # Manager listener, called with the shared lock held
+        for event in events:
+            if self._sink(event) is None or not self._watermark < event.date - self.lead <= self._horizon_end:
+                continue
+            if action == 'add':
+                heapq.heappush(self._heap, (event.date - self.lead, next(self._sequence), event))
+            else:
+                self._cancelled[self._key(event)] += 1
+        self._wake.notify()
+
+    def tick(self, now=None):
+        """Send every reminder due by now (default: the current time) and return how many were sent."""
+        now = now or datetime.now()
+        due = []
+        with self._lock:
+            self._fill(now + self.horizon)
+            while self._heap and self._heap[0][0] <= now:
+                event = heapq.heappop(self._heap)[2]
+                key = self._key(event)
+                if self._cancelled[key]:
+                    self._cancelled[key] -= 1
+                    if not self._cancelled[key]:
+                        del self._cancelled[key]
+                    self._retries.pop(key, None)
+                    continue
+                due.append(event)
+            self._watermark = max(self._watermark, now)
+        # The sinks run outside the lock, so the manager stays usable while they work;
+        # reminders go to the pool in batches, which keeps its overhead per reminder small
+        batches = {}
+        for event in due:
+            batches.setdefault(self._sink(event), []).append(event)
+        futures = [self._pool.submit(self._send, sink, events[offset:offset + self.batch_size])
+                   for sink, events in batches.items() for offset in range(0, len(events), self.batch_size)]
+        failed = [event for future in futures for event in future.result()]
+        with self._lock:
+            self.sent += len(due) - len(failed)
+            self.failed += len(failed)
+            for event in due:
+                self._retries.pop(self._key(event), None)
+            for event in failed:
+                self._retries[self._key(event)] = event.date - self.lead
+                heapq.heappush(self._heap, (now + self.retry_delay, next(self._sequence), event))
+            # Held before the oldest reminder still to retry, so a restart sends that one too
+            if self._retries:
+                self._watermark = min(self._watermark, min(self._retries.values()) - self.resolution)
+            self._save_watermark(self._watermark)
+        return len(due) - len(failed)
+
+    @staticmethod
+    def _send(sink, events):
+        # Returns the reminders the sink failed to send
+        failed = []
+        for event in events:
+            try:
+                sink(event)
+            except Exception:
+                failed.append(event)
+        return failed
+
+    def _load_watermark(self):
+        if self.state_filename is None:
+            return None
+        try:
+            with open(self.state_filename) as file:
+                return datetime.fromisoformat(json.load(file)['watermark'])
+        except FileNotFoundError:
+            return None
+
+    def _save_watermark(self, watermark):
+        if self.state_filename is None:
+            return
+        temporary = self.state_filename + '.tmp'
+        with open(temporary, 'w') as file:
+            json.dump({'version': 1, 'watermark': watermark.isoformat()}, file)
+        os.replace(temporary, self.state_filename)
+
+    def start(self):
+        """Send reminders from a background thread as they fall due; returns the dispatcher."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='event-notifications', daemon=True)
+                self._thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if self._closed:
+                    return
+                now = datetime.now()
+                # Woken for the next reminder, or half a horizon ahead of running out of scheduled ones
+                wake = self._horizon_end - self.horizon / 2
+                if self._heap:
+                    wake = min(wake, self._heap[0][0])
+                if wake > now:
+                    self._wake.wait((wake - now).total_seconds())
+                    continue
+            self.tick()
+
+    def stop(self):
+        """Stop the background thread and stop following the manager's changes."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            self._wake.notify_all()
+            self.manager.remove_listener(self._changed)
+        if self._thread is not None:
+            self._thread.join()
+        self._pool.shutdown()
@@ -1,7 +1,20 @@
+import io
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
 import unittest
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
 from unittest.mock import patch, mock_open
-from ubs_mytodolist import Event, EventManager
+from bench_mytodolist import compare_results, generate_events, run_benchmark
+from cli_mytodolist import main as cli_main
+from core_mytodolist import (CsvFileStorage, Event, EventArchive, EventManager, EventManagerCache, EventShards,
+                            EventStore, ImageCache, Instrumentation, LogFileSink, MappedEventStore,
+                            NotificationDispatcher, SmtpSink, SqliteStorage, instrumentation, migrate_csv_to_sqlite,
+                            parse_event_date, split_csv)
 
 class TestEvent(unittest.TestCase):
     def test_event_to_dict(self):
@@ -22,6 +35,207 @@ class TestEvent(unittest.TestCase):
         }
         self.assertEqual(event.to_dict(), expected_dict)
 
+    def test_event_to_dict_with_id(self):
+        """Test that an event's ID is part of its dictionary once it has one."""
+        event = Event("Meeting", datetime(2024, 11, 22, 15, 0), "", "Work", "Email", "0123456789abcdef")
+        self.assertEqual(event.to_dict()["id"], "0123456789abcdef")
+
+    def test_event_has_no_instance_dict(self):
+        """Test that events use slots instead of a per-instance dictionary."""
+        event = Event("Meeting", datetime(2024, 11, 22, 15, 0), "", "Work", "Email")
+        self.assertFalse(hasattr(event, "__dict__"))
+
+class TestEventStore(unittest.TestCase):
+    def setUp(self):
+        self.events = [
+            Event("First", datetime(2024, 11, 22, 15, 0), "a", "Work", "Email"),
+            Event("Second", datetime(2024, 11, 20, 9, 30), "b", "Home", "None"),
+            Event("Third", datetime(2024, 11, 21, 23, 59), "c", "Work", "Email"),
+        ]
+        self.store = EventStore(self.events)
+
+    def test_materializes_events(self):
+        """Test that stored events come back with the same fields."""
+        self.assertEqual(len(self.store), 3)
+        self.assertEqual([event.to_dict() for event in self.store], [event.to_dict() for event in self.events])
+        self.assertEqual(self.store[-1].name, "Third")
+        self.assertEqual([event.name for event in self.store[1:]], ["Second", "Third"])
+
+    def test_pop(self):
+        """Test removing an event by position."""
+        self.assertEqual(self.store.pop(0).name, "First")
+        self.assertEqual([event.name for event in self.store], ["Second", "Third"])
+
+    def test_between(self):
+        """Test range queries over the columns."""
+        events = self.store.between(datetime(2024, 11, 20, 9, 30), datetime(2024, 11, 22, 15, 0))
+        self.assertEqual([event.name for event in events], ["Second", "Third"])
+        events = self.store.between(datetime(2024, 11, 20, 9, 30, 1), datetime(2024, 11, 22, 15, 0, 1), "work")
+        self.assertEqual([event.name for event in events], ["Third", "First"])
+
+    def test_columnar_manager(self):
+        """Test that a columnar EventManager answers queries like the list-backed one."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, "events.csv")
+            manager = EventManager(filename)
+            for event in self.events:
+                manager.add_event(event.name, event.date, event.comments, event.category, event.notifications)
+            columnar = EventManager(filename, columnar=True)
+            self.assertIsInstance(columnar.events, EventStore)
+            start, end = datetime(2024, 11, 20, 12, 0), datetime(2024, 11, 23)
+            self.assertEqual(columnar.count_between(start, end), manager.count_between(start, end))
+            columnar.remove_event(0)
+            self.assertEqual(columnar.count_between(start, end), {"Work": 1})
+            self.assertEqual([event.name for event in EventManager(filename).events], ["Second", "Third"])
+
+class TestSqliteStorage(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_filename = os.path.join(self.tmpdir.name, "events.db")
+        self.storage = SqliteStorage(self.db_filename)
+        self.manager = EventManager(storage=self.storage)
+        for name, day, category in [("First", 22, "Work"), ("Second", 20, "Home"), ("Third", 21, "Work")]:
+            self.manager.add_event(name, datetime(2024, 11, day, 9, 0), "", category, "Email")
+
+    def tearDown(self):
+        self.storage.close()
+        self.tmpdir.cleanup()
+
+    def test_queries_pushed_down(self):
+        """Test range queries and counts answered by the database."""
+        events = self.manager.events_between(datetime(2024, 11, 20, 9, 0), datetime(2024, 11, 22, 9, 0))
+        self.assertEqual([event.name for event in events], ["Second", "Third"])
+        events = self.manager.events_between(datetime(2024, 11, 1), datetime(2024, 12, 1), "WORK")
+        self.assertEqual([event.name for event in events], ["Third", "First"])
+        summary = self.manager.count_between(datetime(2024, 11, 20), datetime(2024, 11, 23))
+        self.assertEqual(summary, {"Home": 1, "Work": 2})
+
+    def test_remove_by_position_persists(self):
+        """Test that a removal is committed and positions follow insertion order."""
+        self.manager.remove_event(1)
+        self.storage.close()
+        self.storage = SqliteStorage(self.db_filename)
+        self.assertEqual([event.name for event in self.storage], ["First", "Third"])
+        self.assertEqual(self.storage[-1].name, "Third")
+
+    def test_migrate_csv(self):
+        """Test the one-shot migration from a CSV file."""
+        csv_filename = os.path.join(self.tmpdir.name, "events.csv")
+        manager = EventManager(csv_filename)
+        manager.add_event("Meeting", datetime(2024, 11, 22, 15, 0), "Notes", "Work", "Email")
+        storage = migrate_csv_to_sqlite(csv_filename, os.path.join(self.tmpdir.name, "migrated.db"))
+        self.assertEqual([event.to_dict() for event in storage], [
+            {"name": "Meeting", "date": "22-11-2024 15:00", "comments": "Notes", "category": "Work",
+             "notifications": "Email", "id": manager.events[0].id}])
+        storage.close()
+
+    def test_migrate_csv_with_archive(self):
+        """Test that the migration also copies the archived events."""
+        csv_filename = os.path.join(self.tmpdir.name, "events.csv")
+        manager = EventManager(csv_filename, archive_after=30)
+        manager.add_event("Old", datetime(2021, 3, 10, 9, 0), "", "Work", "Email")
+        manager.add_event("New", datetime.now(), "", "Work", "Email")
+        self.assertEqual(len(manager.events), 1)
+        storage = migrate_csv_to_sqlite(csv_filename, os.path.join(self.tmpdir.name, "migrated.db"))
+        self.assertEqual([event.name for event in storage], ["Old", "New"])
+        storage.close()
+
+class TestCsvFileStorage(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmpdir.name, "events.csv")
+        self.manager = EventManager(storage=CsvFileStorage(self.filename))
+        for name, day, category in [("First", 22, "Work"), ("Second", 20, "Home"), ("Third", 21, "Work")]:
+            self.manager.add_event(name, datetime(2024, 11, day, 9, 0), "", category, "Email")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_iter_events_filters_rows(self):
+        """Test that streamed iteration applies the date and category predicates."""
+        events = self.manager.iter_events(start=datetime(2024, 11, 21), category="work")
+        self.assertEqual([event.name for event in events], ["First", "Third"])
+        events = self.manager.iter_events(end=datetime(2024, 11, 21, 9, 0))
+        self.assertEqual([event.name for event in events], ["Second"])
+
+    def test_queries_and_removal(self):
+        """Test range queries, counts and removal against the streamed file."""
+        events = self.manager.events_between(datetime(2024, 11, 20), datetime(2024, 11, 23))
+        self.assertEqual([event.name for event in events], ["Second", "Third", "First"])
+        self.manager.remove_event(0)
+        self.assertEqual(self.manager.count_between(datetime(2024, 11, 20), datetime(2024, 11, 23)),
+                         {"Home": 1, "Work": 1})
+        self.assertEqual([event.name for event in EventManager(self.filename).events], ["Second", "Third"])
+
+    def test_add_to_file_without_ids(self):
+        """Test that adding to a file from before IDs keeps the new ID and the ones of the old rows."""
+        with open(self.filename, "w") as file:
+            file.write("name,date,comments,category,notifications\nMeeting,22-11-2024 15:00,,Work,Email\n")
+        manager = EventManager(storage=CsvFileStorage(self.filename))
+        old_id = manager.events[0].id
+        lunch = Event("Lunch", datetime(2024, 11, 23, 12, 0), "", "Home", "None")
+        manager.add_events([lunch])
+        new_id = lunch.id
+        self.assertEqual(manager.get_event(old_id).name, "Meeting")
+        self.assertEqual(manager.get_event(new_id).name, "Lunch")
+        self.assertEqual(manager.remove_event_by_id(new_id).name, "Lunch")
+        self.assertEqual([event.id for event in EventManager(self.filename).events], [old_id])
+
+    def test_iter_events_in_memory(self):
+        """Test that loaded managers offer the same iteration API."""
+        manager = EventManager(self.filename)
+        events = manager.iter_events(start=datetime(2024, 11, 21), category="work")
+        self.assertEqual([event.name for event in events], ["Third", "First"])
+
+class TestMappedEventStore(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmpdir.name, "events.csv")
+        manager = EventManager(self.filename)
+        manager.add_events([Event("Standup", datetime(2024, 11, 22, 9, 0), "Daily", "Work", "Email"),
+                            Event("Dentist", datetime(2024, 11, 20, 15, 0), "", "Personal", "SMS"),
+                            Event("Review, final", datetime(2024, 11, 22, 14, 0), "\u00e9t\u00e9", "Work", "None")])
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_snapshot_answers_queries(self):
+        """Test that a second load maps the snapshot and answers like the parsed CSV."""
+        EventManager(self.filename, mapped=True)
+        manager = EventManager(self.filename, mapped=True)
+        self.assertIsInstance(manager.events, MappedEventStore)
+        self.assertEqual([event.to_dict() for event in manager.events],
+                         [event.to_dict() for event in EventManager(self.filename).events])
+        events = manager.events_between(datetime(2024, 11, 21), datetime(2024, 11, 23), "work")
+        self.assertEqual([event.name for event in events], ["Standup", "Review, final"])
+        self.assertEqual(manager.count_between(datetime(2024, 11, 20), datetime(2024, 11, 22, 10, 0)),
+                         {"Personal": 1, "Work": 1})
+
+    def test_snapshot_follows_csv(self):
+        """Test that the snapshot is rebuilt after the CSV changes and after the manager's own writes."""
+        EventManager(self.filename, mapped=True)
+        EventManager(self.filename).add_event("Gym", datetime(2024, 11, 23, 7, 0), "", "Health", "None")
+        manager = EventManager(self.filename, mapped=True)
+        self.assertEqual(len(manager.events), 4)
+
+        manager.remove_events([0, 1])
+        self.assertEqual([event.name for event in manager.events], ["Review, final", "Gym"])
+        reloaded = EventManager(self.filename, mapped=True)
+        self.assertIsInstance(reloaded.events, MappedEventStore)
+        self.assertEqual([event.name for event in reloaded.events], ["Review, final", "Gym"])
+
+    def test_version_mismatch_is_ignored(self):
+        """Test that a snapshot with another version is not used."""
+        EventManager(self.filename, mapped=True)
+        stat = os.stat(self.filename)
+        source = (stat.st_mtime_ns, stat.st_size)
+        self.assertIsNotNone(MappedEventStore.open(self.filename + ".snap", source))
+        with patch.object(MappedEventStore, "version", MappedEventStore.version + 1):
+            self.assertIsNone(MappedEventStore.open(self.filename + ".snap", source))
+            manager = EventManager(self.filename, mapped=True)
+        self.assertIsInstance(manager.events, list)
+        self.assertEqual(len(manager.events), 3)
+
 class TestEventManager(unittest.TestCase):
     @patch("builtins.open", new_callable=mock_open, read_data="name,date,comments,category,notifications\n")
     def test_load_events_empty(self, mock_file):
@@ -116,5 +330,975 @@ class TestEventManager(unittest.TestCase):
         self.assertEqual(summary.get("Work"), 1)
         self.assertEqual(summary.get("Personal"), 1)
 
+    @patch("builtins.open", new_callable=mock_open,
+           read_data="name,date,comments,category,notifications\n"
+                     "Meeting,22-11-2024 15:00,Discuss project,Work,Email\n"
+                     "Broken,31-02-2024 15:00,Bad day,Work,Email\n"
+                     "Short,22-11-2024 16:00\n"
+                     "\"Lunch, late\",1-12-2024 12:30,\"Two\nlines\",Home,None\n")
+    def test_load_events_skips_malformed_rows(self, mock_file):
+        """Test that malformed rows are counted and skipped instead of aborting the load."""
+        manager = EventManager("test_events.csv")
+        self.assertEqual([event.name for event in manager.events], ["Meeting", "Lunch, late"])
+        self.assertEqual(manager.events[1].comments, "Two\nlines")
+        self.assertEqual(manager.events[1].date, datetime(2024, 12, 1, 12, 30))
+        self.assertEqual(manager.load_errors, 2)
+
+class TestEventIds(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmpdir.name, "events.csv")
+        self.events = [Event(name, datetime(2024, 11, 22, hour, 0), "", "Work", "Email")
+                       for hour, name in enumerate(["Standup", "Review", "Retro"], start=9)]
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_ids_persist(self):
+        """Test that every mode assigns IDs once and keeps them across reloads."""
+        for options in [{}, {"columnar": True}, {"journaled": True}, {"mapped": True}]:
+            with self.subTest(**options):
+                for suffix in ["", ".journal", ".snap"]:
+                    if os.path.exists(self.filename + suffix):
+                        os.remove(self.filename + suffix)
+                manager = EventManager(self.filename, **options)
+                manager.add_events(Event(event.name, event.date, "", "Work", "Email") for event in self.events)
+                ids = [event.id for event in manager.events]
+                self.assertEqual(len(set(ids)), 3)
+                reloaded = EventManager(self.filename, **options)
+                self.assertEqual([event.id for event in reloaded.events], ids)
+                self.assertEqual(reloaded.get_event(ids[1]).name, "Review")
+
+    def test_legacy_file_gets_ids(self):
+        """Test that a file written before IDs loads with IDs that are kept from the next save on."""
+        with open(self.filename, "w") as file:
+            file.write("name,date,comments,category,notifications\nMeeting,22-11-2024 15:00,,Work,Email\n")
+        manager = EventManager(self.filename)
+        event_id = manager.events[0].id
+        self.assertIsNotNone(event_id)
+        manager.add_event("Lunch", datetime(2024, 11, 22, 12, 0), "", "Personal", "None")
+        self.assertEqual(EventManager(self.filename).get_event(event_id).name, "Meeting")
+
+    def test_legacy_ids_are_stable(self):
+        """Test that rows without IDs get the same IDs on every read, distinct ones for identical rows."""
+        with open(self.filename, "w") as file:
+            file.write("name,date,comments,category,notifications\n" + "Meeting,22-11-2024 15:00,,Work,Email\n" * 3)
+        ids = [event.id for event in EventManager(self.filename).events]
+        self.assertEqual(len(set(ids)), 3)
+        self.assertEqual([event.id for event in EventManager(self.filename, columnar=True).events], ids)
+
+    def test_legacy_ids_do_not_depend_on_filters(self):
+        """Test that a filtered read of rows without IDs gives them the IDs of a full read."""
+        with open(self.filename, "w") as file:
+            file.write("name,date,comments,category,notifications\n"
+                       + "Meeting,22-11-2024 15:00,,Work,Email\nLunch,23-11-2024 12:00,,Home,None\n" * 2)
+        ids = [event.id for event in EventManager(self.filename).events]
+        storage = CsvFileStorage(self.filename)
+        self.assertEqual([event.id for event in storage.iter_events(category="home")], ids[1::2])
+        self.assertEqual([event.id for event in storage.iter_events(start=datetime(2024, 11, 23))], ids[1::2])
+
+    def test_journaled_delete_on_legacy_file(self):
+        """Test that a journaled removal by ID from a file without IDs survives a reload."""
+        with open(self.filename, "w") as file:
+            file.write("name,date,comments,category,notifications\n"
+                       "Meeting,22-11-2024 15:00,,Work,Email\nLunch,22-11-2024 12:00,,Home,None\n")
+        manager = EventManager(self.filename, journaled=True)
+        manager.remove_event_by_id(manager.events[0].id)
+        self.assertEqual([event.name for event in EventManager(self.filename, journaled=True).events], ["Lunch"])
+
+    def test_remove_by_id_leaves_tombstone(self):
+        """Test that a removal by ID is O(1), hidden from every query and compacted on positional use."""
+        manager = EventManager(self.filename, journaled=True)
+        manager.add_events(self.events)
+        removed = manager.remove_event_by_id(self.events[1].id)
+        self.assertIs(removed, self.events[1])
+        self.assertIsNone(manager.remove_event_by_id(self.events[1].id))
+        self.assertIsNone(manager.get_event(self.events[1].id))
+        self.assertEqual(manager._tombstones, {self.events[1].id})
+        self.assertEqual([event.name for event in manager.events_between(datetime(2024, 11, 22),
+                                                                          datetime(2024, 11, 23))],
+                         ["Standup", "Retro"])
+        self.assertEqual(manager.search("review"), [])
+        self.assertEqual(manager.count_between(datetime(2024, 11, 22), datetime(2024, 11, 23)), {"Work": 2})
+
+        manager.remove_event(1)  # positions are taken after compaction
+        self.assertEqual(manager._tombstones, set())
+        self.assertEqual([event.name for event in manager.events], ["Standup"])
+        self.assertEqual([event.name for event in EventManager(self.filename, journaled=True).events],
+                         ["Standup"])
+
+    def test_remove_by_id_in_other_containers(self):
+        """Test removal by ID with the columnar store and SQLite storage."""
+        columnar = EventManager(self.filename, columnar=True)
+        columnar.add_events(self.events)
+        self.assertEqual(columnar.remove_event_by_id(self.events[0].id).name, "Standup")
+        self.assertEqual([event.name for event in EventManager(self.filename).events], ["Review", "Retro"])
+
+        storage = SqliteStorage(os.path.join(self.tmpdir.name, "events.db"))
+        manager = EventManager(storage=storage)
+        manager.add_events(self.events)
+        self.assertEqual(manager.remove_event_by_id(self.events[2].id).name, "Retro")
+        self.assertIsNone(manager.get_event(self.events[2].id))
+        self.assertEqual([event.name for event in storage], ["Standup", "Review"])
+        storage.close()
+
+    def test_concurrent_removals_by_id(self):
+        """Test that two processes' managers removing different events by ID both take effect."""
+        EventManager(self.filename).add_events(self.events)
+        first = EventManager(self.filename, atomic=True)
+        second = EventManager(self.filename, atomic=True)
+        first.remove_event_by_id(self.events[0].id)
+        second.remove_event_by_id(self.events[2].id)
+        self.assertEqual([event.name for event in EventManager(self.filename).events], ["Review"])
+
+class TestEventArchive(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmpdir.name, "events.csv")
+        self.now = datetime.now().replace(second=0, microsecond=0)
+        manager = EventManager(self.filename)
+        manager.add_event("Old meeting", datetime(2021, 3, 10, 9, 0), "", "Work", "Email")
+        manager.add_event("Old lunch", datetime(2021, 3, 20, 12, 0), "", "Home", "None")
+        manager.add_event("Older call", datetime(2020, 12, 1, 8, 0), "", "Work", "SMS")
+        manager.add_event("Standup", self.now, "", "Work", "Email")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_old_events_move_to_monthly_segments(self):
+        """Test that events past the horizon leave the file for compressed per-month segments."""
+        manager = EventManager(self.filename, archive_after=30)
+        self.assertEqual([event.name for event in manager.events], ["Standup"])
+        self.assertEqual(manager.archive.months(), [(2020, 12), (2021, 3)])
+        self.assertEqual([event.name for event in EventManager(self.filename).events], ["Standup"])
+
+    def test_queries_reach_only_the_segments_they_need(self):
+        """Test that recent queries read no segment and older ranges merge archived and recent events."""
+        manager = EventManager(self.filename, archive_after=30)
+        manager.archive._segments.clear()
+        self.assertEqual(manager.summarize_events("today"), {"Work": 1})
+        self.assertEqual(len(manager.archive._segments), 0)
+        events = manager.events_between(datetime(2021, 1, 1), self.now + timedelta(minutes=1))
+        self.assertEqual([event.name for event in events], ["Old meeting", "Old lunch", "Standup"])
+        self.assertEqual(list(manager.archive._segments), [(2021, 3)])
+        self.assertEqual(manager.count_between(datetime(2021, 3, 1), datetime(2021, 4, 1)), {"Work": 1, "Home": 1})
+        self.assertEqual([event.name for event in manager.iter_events(category="work")],
+                         ["Older call", "Old meeting", "Standup"])
+        self.assertEqual([event.name for event in manager.search("lunch")], ["Old lunch"])
+
+    def test_partial_days_count_archived_events_once(self):
+        """Test that a range starting mid-day over archived events counts each of them once."""
+        manager = EventManager(self.filename, archive_after=30)
+        self.assertEqual(manager.count_between(datetime(2021, 3, 10, 8, 0), datetime(2021, 3, 20, 13, 0)),
+                         {"Work": 1, "Home": 1})
+
+    def test_remove_archived_event_by_id(self):
+        """Test that an archived event is found and removed by its ID."""
+        manager = EventManager(self.filename, archive_after=30)
+        event_id = manager.events_between(datetime(2021, 3, 20), datetime(2021, 3, 21))[0].id
+        self.assertEqual(manager.get_event(event_id).name, "Old lunch")
+        self.assertEqual(manager.remove_event_by_id(event_id).name, "Old lunch")
+        self.assertIsNone(EventManager(self.filename).get_event(event_id))
+        self.assertEqual(EventArchive(manager.archive_directory).count_between(datetime.min, datetime.max),
+                         {"Work": 2})
+
+    def test_pages_reach_the_archive(self):
+        """Test that pages in date order list archived events, reading only the segments they show."""
+        manager = EventManager(self.filename, archive_after=30)
+        manager.archive._segments.clear()
+        total, rows = manager.page_events(0, 2, descending=True)
+        self.assertEqual(total, 4)
+        self.assertEqual([event.name for idx, event in rows], ["Standup", "Old lunch"])
+        self.assertEqual([idx for idx, event in rows], [0, None])
+        self.assertEqual(list(manager.archive._segments), [(2021, 3)])
+        total, rows = manager.page_events(1, 2)
+        self.assertEqual([event.name for idx, event in rows], ["Old lunch", "Standup"])
+        self.assertEqual([event.name for idx, event in manager.page_events(0, 10, sort_by="name")[1]],
+                         ["Old lunch", "Old meeting", "Older call", "Standup"])
+        self.assertEqual([event.name for idx, event in manager.page_events(0, 10, search="old")[1]],
+                         ["Older call", "Old meeting", "Old lunch"])
+        event = manager.page_events(0, 1)[1][0][1]
+        self.assertEqual(manager.remove_event_by_id(event.id).name, "Older call")
+        self.assertEqual(manager.page_events()[0], 3)
+
+    def test_id_lookup_reads_only_the_segment_holding_it(self):
+        """Test that an unknown ID reads no segment and a known one only its own, even without a sidecar."""
+        manager = EventManager(self.filename, archive_after=30)
+        event_id = manager.events_between(datetime(2020, 12, 1), datetime(2020, 12, 2))[0].id
+        archive = EventArchive(manager.archive_directory)
+        self.assertIsNone(archive.get_id("no-such-id"))
+        self.assertIsNone(manager.remove_event_by_id("no-such-id"))
+        self.assertEqual(len(archive._segments), 0)
+        self.assertEqual(archive.get_id(event_id).name, "Older call")
+        self.assertEqual(list(archive._segments), [(2020, 12)])
+        os.remove(archive.ids_filename((2021, 3)))
+        archive = EventArchive(manager.archive_directory)
+        self.assertEqual(archive.get_id(event_id).name, "Older call")
+        self.assertTrue(os.path.exists(archive.ids_filename((2021, 3))))
+
+    def test_archiving_again_skips_archived_ids(self):
+        """Test that events already in a segment (e.g. after a crash before the file was saved) are not doubled."""
+        manager = EventManager(self.filename, archive_after=30)
+        archived = manager.events_between(datetime.min, datetime(2022, 1, 1))
+        manager.archive.add(archived)
+        self.assertEqual(len(EventArchive(manager.archive_directory).between(datetime.min, datetime.max)), 3)
+
+class TestParallelLoad(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmpdir.name, "events.csv")
+        with open(self.filename, "w", newline="") as file:
+            file.write("name,date,comments,category,notifications,id\n")
+            for idx in range(300):
+                comments = f'"Line one\nline ""{idx}"", two"' if idx % 7 == 0 else "Notes"
+                file.write(f"Event {idx},{idx % 28 + 1:02d}-11-2024 09:00,{comments},Work,Email,{idx:016x}\n")
+            file.write("Broken,not a date,,Work,Email,\n")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_split_at_record_boundaries(self):
+        """Test that every chunk starts at a record, also next to quoted multi-line fields."""
+        header, chunks = split_csv(self.filename, 16)
+        self.assertEqual(header, b"name,date,comments,category,notifications,id\n")
+        self.assertEqual(chunks[0][0], len(header))
+        self.assertEqual(chunks[-1][1], os.path.getsize(self.filename))
+        with open(self.filename, "rb") as file:
+            data = file.read()
+        for start, end in chunks:
+            self.assertTrue(data[start:end].startswith((b"Event ", b"Broken")))
+            self.assertEqual(data[:start].count(b'"') % 2, 0)
+
+    def test_parallel_load_matches_serial(self):
+        """Test that a load split across worker processes gives the serial result in order."""
+        serial = EventManager(self.filename)
+        for options in [{}, {"columnar": True}]:
+            with self.subTest(**options), patch.object(EventManager, "parallel_chunk_bytes", 1024):
+                manager = EventManager(self.filename, parallel=2, **options)
+                self.assertEqual(manager._load_workers(), 2)
+                self.assertEqual([event.to_dict() for event in manager.events],
+                                 [event.to_dict() for event in serial.events])
+                self.assertEqual(manager.load_errors, 1)
+
+    def test_parallel_load_of_legacy_file_matches_serial_ids(self):
+        """Test that identical rows without IDs in different chunks get the IDs of a serial load."""
+        with open(self.filename, "w", newline="") as file:
+            file.write("name,date,comments,category,notifications\n")
+            file.write("Event,01-11-2024 09:00,Notes,Work,Email\n" * 300)
+        serial = [event.id for event in EventManager(self.filename).events]
+        with patch.object(EventManager, "parallel_chunk_bytes", 1024):
+            self.assertEqual([event.id for event in EventManager(self.filename, parallel=2).events], serial)
+        self.assertEqual(len(set(serial)), 300)
+
+    def test_parallel_load_of_blank_ids_matches_serial_ids(self):
+        """Test that identical rows under an id header but with blank IDs get distinct IDs of a serial load."""
+        with open(self.filename, "w", newline="") as file:
+            file.write("name,date,comments,category,notifications,id\n")
+            file.write("Event,01-11-2024 09:00,Notes,Work,Email,\n" * 300)
+        serial = [event.id for event in EventManager(self.filename).events]
+        with patch.object(EventManager, "parallel_chunk_bytes", 1024):
+            manager = EventManager(self.filename, parallel=2)
+            self.assertEqual([event.id for event in manager.events], serial)
+            manager.remove_event_by_id(serial[150])
+        self.assertEqual(len(set(serial)), 300)
+        self.assertEqual(len(EventManager(self.filename).events), 299)
+
+    def test_small_file_loads_serially(self):
+        """Test that a file below the per-worker minimum is not split."""
+        self.assertEqual(EventManager(self.filename, parallel=True)._load_workers(), 1)
+
+class TestParseEventDate(unittest.TestCase):
+    def test_fixed_layout(self):
+        """Test parsing the fixed DD-MM-YYYY HH:MM layout."""
+        self.assertEqual(parse_event_date("22-11-2024 15:05"), datetime(2024, 11, 22, 15, 5))
+
+    def test_strptime_fallback(self):
+        """Test that other layouts are left to strptime, which stays strict."""
+        self.assertEqual(parse_event_date("2-1-2024 9:05"), datetime(2024, 1, 2, 9, 5))
+        for text in ["22/11/2024 15:00", "2024-11-22 15:00", "22-11-2024T15:00", "32-11-2024 15:00",
+                     "22-11-2024 15,00", "22-11-2024 15.00", "22-11-2024 1500Z"]:
+            with self.assertRaises(ValueError):
+                parse_event_date(text)
+
+    def test_offset_date_is_a_load_error(self):
+        """Test that a date with a UTC offset is counted as a malformed row instead of breaking the load."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, "events.csv")
+            with open(filename, "w") as file:
+                file.write("name,date,comments,category,notifications\n"
+                           "Meeting,22-11-2024 1500Z,,Work,Email\nLunch,22-11-2024 12:00,,Home,None\n")
+            manager = EventManager(filename)
+            self.assertEqual([event.name for event in manager.events], ["Lunch"])
+            self.assertEqual(manager.load_errors, 1)
+
+class TestJournaledEventManager(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmpdir.name, "events.csv")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_journal_replay(self):
+        """Test that journaled adds and removes are replayed on load without rewriting the snapshot."""
+        manager = EventManager(self.filename, journaled=True)
+        for name in ["First", "Second", "Third"]:
+            manager.add_event(name, datetime(2024, 11, 22, 15, 0), "", "Work", "Email")
+        manager.remove_event(1)
+        self.assertFalse(os.path.exists(self.filename))
+
+        reloaded = EventManager(self.filename, journaled=True)
+        self.assertEqual([event.name for event in reloaded.events], ["First", "Third"])
+        self.assertEqual(reloaded.journal_size, 4)
+
+    def test_journal_compaction(self):
+        """Test that the journal is folded into the snapshot once it reaches the threshold."""
+        manager = EventManager(self.filename, journaled=True, compact_threshold=2)
+        manager.add_event("First", datetime(2024, 11, 22, 15, 0), "", "Work", "Email")
+        manager.add_event("Second", datetime(2024, 11, 23, 15, 0), "", "Work", "Email")
+        self.assertEqual(manager.journal_size, 0)
+        self.assertEqual(os.path.getsize(manager.journal_filename), 0)
+
+        reloaded = EventManager(self.filename)
+        self.assertEqual([event.name for event in reloaded.events], ["First", "Second"])
+
+class TestBulkImport(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmpdir.name, "events.csv")
+        self.events = [Event(f"Event {idx}", datetime(2024, 11, 1 + idx % 28, 9, 0), "", "Work", "Email")
+                       for idx in range(50)]
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_add_events_saves_once(self):
+        """Test that a bulk add is persisted with a single save and keeps the indexes in order."""
+        manager = EventManager(self.filename)
+        with patch.object(manager, "save_events", wraps=manager.save_events) as save:
+            self.assertEqual(manager.add_events(self.events), 50)
+        self.assertEqual(save.call_count, 1)
+        self.assertEqual(len(EventManager(self.filename).events), 50)
+        dates = [event.date for event in manager.events_between(datetime(2024, 11, 1), datetime(2024, 12, 1))]
+        self.assertEqual(dates, sorted(dates))
+        self.assertEqual(len(manager.search("event 4")), 1 + 10)
+
+    def test_invalid_date_changes_nothing(self):
+        """Test that a batch with a date carrying a UTC offset is refused before any event is added."""
+        manager = EventManager(self.filename)
+        manager.add_events(self.events[:2])
+        aware = Event("Offset", datetime(2024, 12, 1, 10, 30, tzinfo=timezone.utc), "", "Work", "Email")
+        with self.assertRaises(ValueError):
+            manager.add_events(self.events[2:4] + [aware])
+        self.assertEqual(len(manager.events), 2)
+        self.assertEqual(len(manager.events_between(datetime.min, datetime.max)), 2)
+        self.assertEqual(len(EventManager(self.filename).events), 2)
+
+    def test_remove_events(self):
+        """Test that a bulk remove uses the positions before removal, in every mode."""
+        for options in [{}, {"journaled": True}, {"columnar": True}]:
+            with self.subTest(**options):
+                if os.path.exists(self.filename):
+                    os.remove(self.filename)
+                manager = EventManager(self.filename, **options)
+                manager.add_events(self.events)
+                removed = manager.remove_events(range(0, 50, 2))
+                self.assertEqual(len(removed), 25)
+                reloaded = EventManager(self.filename, **options)
+                self.assertEqual([event.name for event in reloaded.events],
+                                 [f"Event {idx}" for idx in range(1, 50, 2)])
+
+    def test_import_export_round_trip(self):
+        """Test that CSV and JSON Lines files round-trip and that invalid records are skipped."""
+        manager = EventManager(self.filename)
+        manager.add_events(self.events)
+        jsonl = os.path.join(self.tmpdir.name, "events.jsonl")
+        self.assertEqual(manager.export_events(jsonl), 50)
+        with open(jsonl, "a") as file:
+            file.write('{"name": "Broken", "date": "not a date"}\n')
+            file.write('{"name": "ISO", "date": "2024-12-01T10:30"}\n')
+            file.write('{"name": "Offset", "date": "2024-12-01T10:30+02:00"}\n')
+
+        imported = EventManager(os.path.join(self.tmpdir.name, "imported.csv"))
+        self.assertEqual(imported.import_events(jsonl), (51, 2))
+        self.assertEqual(imported.events[-1].date, datetime(2024, 12, 1, 10, 30))
+
+        exported = os.path.join(self.tmpdir.name, "export.csv")
+        self.assertEqual(imported.export_events(exported, category="work"), 50)
+        copy = EventManager(os.path.join(self.tmpdir.name, "copy.csv"))
+        self.assertEqual(copy.import_events(exported), (50, 0))
+
+    def test_reimport_gets_new_ids(self):
+        """Test that importing an export again keeps both copies under distinct IDs in every container."""
+        exported = os.path.join(self.tmpdir.name, "export.jsonl")
+        EventManager(self.filename).add_events(self.events[:5])
+        EventManager(self.filename).export_events(exported)
+        for name, options in [("list", {}), ("columnar", {"columnar": True}),
+                              ("sqlite", {"storage": SqliteStorage(os.path.join(self.tmpdir.name, "events.db"))})]:
+            with self.subTest(name):
+                manager = EventManager(os.path.join(self.tmpdir.name, f"{name}.csv"), **options)
+                self.assertEqual(manager.import_events(exported), (5, 0))
+                self.assertEqual(manager.import_events(exported), (5, 0))
+                self.assertEqual(len({event.id for event in manager.events}), 10)
+
+class TestAtomicWriteBehind(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmpdir.name, "events.csv")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_concurrent_writers_keep_both_updates(self):
+        """Test that an atomic save merges changes another writer saved since the last load."""
+        first = EventManager(self.filename, atomic=True)
+        second = EventManager(self.filename, atomic=True)
+        first.add_event("First", datetime(2024, 11, 22, 15, 0), "", "Work", "Email")
+        second.add_event("Second", datetime(2024, 11, 23, 15, 0), "", "Work", "Email")
+        second.remove_event(0)
+        self.assertEqual([event.name for event in EventManager(self.filename).events], ["Second"])
+        self.assertEqual(os.listdir(self.tmpdir.name).count("events.csv"), 1)
+        self.assertFalse([name for name in os.listdir(self.tmpdir.name) if name.endswith(".tmp")])
+
+    def test_journaled_writers_keep_each_others_compactions(self):
+        """Test that a journal append after another writer compacted does not hide that from the next save."""
+        first = EventManager(self.filename, journaled=True, atomic=True, compact_threshold=3)
+        second = EventManager(self.filename, journaled=True, atomic=True, compact_threshold=3)
+        date = datetime(2024, 11, 22, 15, 0)
+        first.add_event("A1", date, "", "Work", "Email")
+        second.add_event("B1", date, "", "Work", "Email")
+        first.add_event("A2", date, "", "Work", "Email")
+        first.add_event("A3", date, "", "Work", "Email")  # compacts
+        second.add_event("B2", date, "", "Work", "Email")
+        second.save_events()
+        names = [event.name for event in EventManager(self.filename, journaled=True).events]
+        self.assertEqual(sorted(names), ["A1", "A2", "A3", "B1", "B2"])
+
+    def test_write_behind_coalesces_saves(self):
+        """Test that a burst of changes is saved once, on flush."""
+        manager = EventManager(self.filename, atomic=True, write_behind=True, flush_interval=60)
+        with patch.object(manager, "_write_snapshot", wraps=manager._write_snapshot) as write:
+            for idx in range(100):
+                manager.add_event(f"Task {idx}", datetime(2024, 11, 22, 15, 0), "", "Work", "Email")
+            self.assertFalse(os.path.exists(self.filename))
+            manager.flush()
+            self.assertEqual(write.call_count, 1)
+        manager.close()
+        self.assertEqual(len(EventManager(self.filename).events), 100)
+
+    def test_write_behind_flushes_within_interval(self):
+        """Test that the background writer saves on its own after the flush interval."""
+        manager = EventManager(self.filename, atomic=True, write_behind=True, flush_interval=0.05)
+        manager.add_event("Meeting", datetime(2024, 11, 22, 15, 0), "", "Work", "Email")
+        for _ in range(100):
+            if os.path.exists(self.filename):
+                break
+            time.sleep(0.05)
+        self.assertEqual(len(EventManager(self.filename).events), 1)
+        manager.close()
+
+    def test_write_behind_retries_failed_save(self):
+        """Test that a failing background save is logged and retried instead of stopping the writer."""
+        manager = EventManager(self.filename, write_behind=True, flush_interval=0.05)
+        write_snapshot = manager._write_snapshot
+        failures = [OSError("disk full")]
+
+        def fail_once():
+            if failures:
+                raise failures.pop()
+            write_snapshot()
+
+        with patch.object(manager, "_write_snapshot", side_effect=fail_once), \
+                self.assertLogs("core_mytodolist", level="ERROR"):
+            manager.add_event("Meeting", datetime(2024, 11, 22, 15, 0), "", "Work", "Email")
+            for _ in range(100):
+                if os.path.exists(self.filename):
+                    break
+                time.sleep(0.05)
+        self.assertEqual(len(EventManager(self.filename).events), 1)
+        self.assertIsNone(manager.save_error)
+        manager.close()
+
+class TestDateIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.manager = EventManager(os.path.join(self.tmpdir.name, "events.csv"))
+        for day, category in [(24, "Work"), (20, "Home"), (22, "Work"), (22, "Home")]:
+            self.manager.add_event(f"Task {day}", datetime(2024, 11, day, 9, 0), "", category, "Email")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_events_between(self):
+        """Test that range queries return events in date order with an exclusive end."""
+        events = self.manager.events_between(datetime(2024, 11, 20, 9, 0), datetime(2024, 11, 24, 9, 0))
+        self.assertEqual([event.date.day for event in events], [20, 22, 22])
+
+    def test_events_between_category(self):
+        """Test that range queries can be restricted to a category."""
+        events = self.manager.events_between(datetime(2024, 11, 1), datetime(2024, 12, 1), category="work")
+        self.assertEqual([event.name for event in events], ["Task 22", "Task 24"])
+
+    def test_index_follows_removal(self):
+        """Test that removed events disappear from range queries."""
+        self.manager.remove_event(0)
+        events = self.manager.events_between(datetime(2024, 11, 1), datetime(2024, 12, 1))
+        self.assertNotIn("Task 24", [event.name for event in events])
+        self.assertEqual(len(events), 3)
+
+    def test_page_events(self):
+        """Test server-side paging, sorting and search."""
+        total, rows = self.manager.page_events(page=1, page_size=3)
+        self.assertEqual(total, 4)
+        self.assertEqual([(idx, event.date.day) for idx, event in rows], [(0, 24)])
+        total, rows = self.manager.page_events(page_size=2, sort_by="category", descending=True)
+        self.assertEqual([event.category for idx, event in rows], ["Work", "Work"])
+        total, rows = self.manager.page_events(search="HOME")
+        self.assertEqual((total, [idx for idx, event in rows]), (2, [1, 3]))
+
+class TestSearchIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmpdir.name, "events.csv")
+        self.manager = EventManager(self.filename)
+        self.manager.add_event("Project kickoff", datetime(2024, 11, 22, 9, 0), "Bring the roadmap", "Work", "Email")
+        self.manager.add_event("Dentist", datetime(2024, 11, 20, 9, 0), "Projector broken?", "Health", "SMS")
+        self.manager.add_event("Roadmap review", datetime(2024, 11, 25, 9, 0), "", "Work", "Email")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_prefix_search(self):
+        """Test that every query word must start a word in the name, comments or category."""
+        self.assertEqual([event.name for event in self.manager.search("proj")], ["Dentist", "Project kickoff"])
+        self.assertEqual([event.name for event in self.manager.search("ROAD work")],
+                         ["Project kickoff", "Roadmap review"])
+        self.assertEqual(self.manager.search("oadmap"), [])
+
+    def test_search_with_date_range(self):
+        """Test combining keyword search with a date range."""
+        events = self.manager.search("roadmap", start=datetime(2024, 11, 23))
+        self.assertEqual([event.name for event in events], ["Roadmap review"])
+
+    def test_index_follows_removal(self):
+        """Test that removed events are no longer found."""
+        self.manager.remove_event(0)
+        self.assertEqual([event.name for event in self.manager.search("roadmap")], ["Roadmap review"])
+        self.assertEqual(self.manager.search("kickoff"), [])
+
+    def test_columnar_search_scans(self):
+        """Test that managers without the index give the same answers."""
+        columnar = EventManager(self.filename, columnar=True)
+        self.assertEqual([event.name for event in columnar.search("ROAD work")],
+                         ["Project kickoff", "Roadmap review"])
+        total, rows = columnar.page_events(search="dent")
+        self.assertEqual([idx for idx, event in rows], [1])
+
+class TestDayAggregates(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.manager = EventManager(os.path.join(self.tmpdir.name, "events.csv"))
+        for day, hour, category in [(20, 8, "Work"), (20, 18, "Home"), (21, 12, "Work"), (23, 7, "Work")]:
+            self.manager.add_event("Task", datetime(2024, 11, day, hour, 0), "", category, "Email")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_count_between_partial_days(self):
+        """Test that counts over ranges starting and ending mid-day match the events in the range."""
+        summary = self.manager.count_between(datetime(2024, 11, 20, 12, 0), datetime(2024, 11, 23, 6, 0))
+        self.assertEqual(summary, {"Home": 1, "Work": 1})
+
+    def test_counts_follow_removal(self):
+        """Test that removing an event updates the per-day counts."""
+        self.manager.remove_event(1)
+        summary = self.manager.count_between(datetime(2024, 11, 20), datetime(2024, 11, 24))
+        self.assertEqual(summary, {"Work": 3})
+
+    def test_count_over_whole_calendar(self):
+        """Test that the widest ranges count every event, also after days gain and lose events."""
+        for options in [{}, {"columnar": True}]:
+            with self.subTest(**options):
+                filename = os.path.join(self.tmpdir.name, f"copy{len(options)}.csv")
+                shutil.copyfile(self.manager.filename, filename)
+                manager = EventManager(filename, **options)
+                self.assertEqual(manager.count_between(datetime.min, datetime.max), {"Home": 1, "Work": 3})
+                manager.count_between(datetime(2024, 11, 1), datetime(2024, 12, 1))
+                manager.add_event("Task", datetime(2024, 11, 22, 9, 0), "", "Home", "Email")
+                manager.remove_event(0)
+                self.assertEqual(manager.count_between(datetime(1824, 11, 20, 12, 0), datetime(2224, 1, 1)),
+                                 {"Home": 2, "Work": 2})
+                self.assertEqual(manager.count_between(datetime.max, datetime.max), {})
+
+    def test_summarize_timeframes(self):
+        """Test summarizing several timeframes in one call."""
+        self.manager.add_event("Now", datetime.now(), "", "Today", "Email")
+        summaries = self.manager.summarize_timeframes()
+        self.assertEqual(set(summaries), {"today", "this_week", "this_month"})
+        self.assertEqual(summaries["today"], {"Today": 1})
+        self.assertEqual(summaries["today"], self.manager.summarize_events("today"))
+
+class TestNotificationDispatcher(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmpdir.name, "events.csv")
+        self.state = os.path.join(self.tmpdir.name, "notifications.json")
+        self.start = datetime(2024, 11, 22, 8, 0)
+        self.manager = EventManager(self.filename)
+        self.manager.add_events([Event("Standup", datetime(2024, 11, 22, 9, 0), "", "Work", "Email"),
+                                 Event("Lunch", datetime(2024, 11, 22, 12, 0), "", "Personal", "None"),
+                                 Event("Review", datetime(2024, 11, 22, 10, 0), "", "Work", "email"),
+                                 Event("Planning", datetime(2024, 11, 25, 9, 0), "", "Work", "Email")])
+        self.sent = []
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def dispatcher(self, **options):
+        return NotificationDispatcher(self.manager, {"Email": self.sent.append}, state_filename=self.state,
+                                      **options)
+
+    def test_dispatches_due_reminders_in_order(self):
+        """Test that reminders go out by due time, only for configured notifications and within the horizon."""
+        dispatcher = self.dispatcher(start=self.start, lead=timedelta(minutes=15))
+        self.assertEqual(len(dispatcher), 2)
+        self.assertEqual(dispatcher.tick(datetime(2024, 11, 22, 8, 50)), 1)
+        self.assertEqual(dispatcher.tick(datetime(2024, 11, 22, 11, 0)), 1)
+        self.assertEqual([event.name for event in self.sent], ["Standup", "Review"])
+        dispatcher.tick(datetime(2024, 11, 25, 9, 0))
+        self.assertEqual([event.name for event in self.sent], ["Standup", "Review", "Planning"])
+        dispatcher.stop()
+
+    def test_follows_manager_changes(self):
+        """Test that added and removed events update the schedule without a rescan."""
+        dispatcher = self.dispatcher(start=self.start)
+        self.manager.add_event("Call", datetime(2024, 11, 22, 8, 30), "", "Work", "Email")
+        self.manager.remove_event(0)
+        dispatcher.tick(datetime(2024, 11, 22, 11, 0))
+        self.assertEqual([event.name for event in self.sent], ["Call", "Review"])
+        dispatcher.stop()
+
+    def test_restart_sends_missed_reminders(self):
+        """Test that reminders due while the dispatcher was down are sent after a restart, once."""
+        dispatcher = self.dispatcher(start=self.start)
+        dispatcher.tick(datetime(2024, 11, 22, 9, 30))
+        dispatcher.stop()
+        restarted = self.dispatcher()
+        self.assertEqual(restarted.tick(datetime(2024, 11, 23)), 1)
+        self.assertEqual([event.name for event in self.sent], ["Standup", "Review"])
+        restarted.stop()
+
+    def test_failing_sink_is_counted(self):
+        """Test that a sink error does not stop the other reminders."""
+        def fail(event):
+            raise OSError("unreachable")
+
+        dispatcher = NotificationDispatcher(self.manager, {"email": fail}, start=self.start)
+        self.assertEqual(dispatcher.tick(datetime(2024, 11, 22, 11, 0)), 0)
+        self.assertEqual(dispatcher.failed, 2)
+        dispatcher.stop()
+
+    def test_failed_reminders_are_retried(self):
+        """Test that a reminder a sink failed to send is tried again, also after a restart."""
+        failures = ["Standup"]
+
+        def flaky(event):
+            if event.name in failures:
+                failures.remove(event.name)
+                raise OSError("unreachable")
+            self.sent.append(event)
+
+        dispatcher = NotificationDispatcher(self.manager, {"email": flaky}, state_filename=self.state,
+                                            start=self.start)
+        self.assertEqual(dispatcher.tick(datetime(2024, 11, 22, 11, 0)), 1)
+        dispatcher.stop()
+        # The saved time stays before the failed reminder, so a restart sends it (and Review again)
+        restarted = self.dispatcher()
+        self.assertEqual(restarted.tick(datetime(2024, 11, 22, 11, 0)), 2)
+        self.assertEqual([event.name for event in self.sent], ["Review", "Standup", "Review"])
+        restarted.stop()
+
+        failures.append("Review")
+        self.sent.clear()
+        dispatcher = NotificationDispatcher(self.manager, {"email": flaky}, start=self.start)
+        dispatcher.tick(datetime(2024, 11, 22, 11, 0))
+        self.assertEqual(dispatcher.tick(datetime(2024, 11, 22, 11, 0, 30)), 0)
+        self.assertEqual(dispatcher.tick(datetime(2024, 11, 22, 11, 1)), 1)
+        self.assertEqual([event.name for event in self.sent], ["Standup", "Review"])
+        dispatcher.stop()
+
+    def test_sinks(self):
+        """Test the log file and SMTP sinks."""
+        event = Event("Standup", datetime(2024, 11, 22, 9, 0), "Room 4", "Work", "Email")
+        log = os.path.join(self.tmpdir.name, "notifications.log")
+        LogFileSink(log)(event)
+        with open(log) as file:
+            self.assertIn("Standup at 22-11-2024 09:00 [Work] Room 4", file.read())
+        with patch("smtplib.SMTP") as smtp:
+            SmtpSink("me@example.com", port=8025)(event)
+        smtp.assert_called_once_with("localhost", 8025, timeout=10)
+        message = smtp.return_value.__enter__.return_value.send_message.call_args[0][0]
+        self.assertEqual(message["Subject"], "Reminder: Standup at 22-11-2024 09:00")
+
+class TestEventManagerCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmpdir.name, "events.csv")
+        self.cache = EventManagerCache()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_reuses_manager_after_own_writes(self):
+        """Test that a manager is reused across lookups, including after it wrote the file itself."""
+        manager = self.cache.get(self.filename)
+        manager.add_event("Meeting", datetime(2024, 11, 22, 15, 0), "", "Work", "Email")
+        self.assertIs(self.cache.get(self.filename), manager)
+
+    def test_reloads_after_external_write(self):
+        """Test that a change made by another writer invalidates the cached manager."""
+        manager = self.cache.get(self.filename)
+        other = EventManager(self.filename)
+        other.add_event("Meeting", datetime(2024, 11, 22, 15, 0), "", "Work", "Email")
+        other.add_event("Lunch", datetime(2024, 11, 22, 12, 0), "", "Home", "Email")
+        reloaded = self.cache.get(self.filename)
+        self.assertIsNot(reloaded, manager)
+        self.assertEqual(len(reloaded.events), 2)
+
+    def test_bounded_cache_closes_evicted_managers(self):
+        """Test that the least recently used manager is flushed and dropped once the cache is full."""
+        cache = EventManagerCache(max_entries=1)
+        manager = cache.get(self.filename, write_behind=True, flush_interval=60)
+        manager.add_event("Meeting", datetime(2024, 11, 22, 15, 0), "", "Work", "Email")
+        cache.get(os.path.join(self.tmpdir.name, "other.csv"))
+        self.assertEqual(len(cache._managers), 1)
+        self.assertEqual(len(EventManager(self.filename).events), 1)
+
+class TestEventShards(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.directory = os.path.join(self.tmpdir.name, "shards")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_users_have_separate_shards(self):
+        """Test that each user reads and writes only their own events."""
+        shards = EventShards(self.directory)
+        shards.manager("Alice").add_event("Meeting", datetime(2024, 11, 22, 15, 0), "", "Work", "Email")
+        shards.manager("Bob").add_event("Lunch", datetime(2024, 11, 22, 12, 0), "", "Home", "None")
+        self.assertEqual([event.name for event in shards.manager("Alice").events], ["Meeting"])
+        self.assertNotEqual(shards.shard_filename("Alice"), shards.shard_filename("Bob"))
+
+    def test_manifest_is_persisted(self):
+        """Test that a new process finds the existing shards through the manifest."""
+        EventShards(self.directory).manager("Zoë / admin").add_event(
+            "Meeting", datetime(2024, 11, 22, 15, 0), "", "Work", "Email")
+        shards = EventShards(self.directory)
+        self.assertEqual(shards.users(), ["Zoë / admin"])
+        self.assertEqual(len(shards.manager("Zoë / admin").events), 1)
+
+    def test_migrate_shared_file(self):
+        """Test that the shared file from before shards is copied into one user's shard, once."""
+        shared = os.path.join(self.tmpdir.name, "events.csv")
+        EventManager(shared).add_event("Meeting", datetime(2024, 11, 22, 15, 0), "", "Work", "Email")
+        shards = EventShards(self.directory)
+        self.assertEqual(len(shards.manager("Bob").events), 0)
+        shards.migrate("Alice", shared)
+        self.assertEqual([event.name for event in shards.manager("Alice").events], ["Meeting"])
+        with self.assertRaises(FileExistsError):
+            shards.migrate("Alice", shared)
+        self.assertEqual(len(EventShards(self.directory).manager("Carol").events), 0)
+
+    def test_loaded_shards_are_bounded(self):
+        """Test that only max_loaded shards stay in memory."""
+        shards = EventShards(self.directory, max_loaded=2)
+        for user in ["a", "b", "c"]:
+            shards.manager(user)
+        self.assertEqual(len(shards._managers._managers), 2)
+
+class TestImageCache(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def write_image(self, name, data):
+        path = os.path.join(self.tmpdir.name, name)
+        with open(path, "wb") as file:
+            file.write(data)
+        return path
+
+    def test_image_read_once(self):
+        """Test that an unchanged image is served from the cache instead of being read again."""
+        cache = ImageCache()
+        path = self.write_image("a.jpg", b"first")
+        self.assertEqual(cache.get(path), b"first")
+        with patch("builtins.open", side_effect=AssertionError("image read again")):
+            self.assertEqual(cache.get(path), b"first")
+
+    def test_image_reloaded_after_change(self):
+        """Test that a modified image is read again."""
+        cache = ImageCache()
+        path = self.write_image("a.jpg", b"first")
+        cache.get(path)
+        self.write_image("a.jpg", b"second")
+        os.utime(path, ns=(0, 0))
+        self.assertEqual(cache.get(path), b"second")
+
+    def test_cache_is_bounded(self):
+        """Test that the least recently used image is evicted once the cache is full."""
+        cache = ImageCache(max_entries=2)
+        paths = [self.write_image(f"{idx}.jpg", b"data") for idx in range(3)]
+        for path in paths:
+            cache.get(path)
+        self.assertEqual([key[0] for key in cache._entries], paths[1:])
+
+class TestInstrumentation(unittest.TestCase):
+    def test_record_and_snapshot(self):
+        """Test that latencies are counted and bucketed into the histogram."""
+        stats = Instrumentation()
+        stats.record("load", 0.0004)
+        stats.record("load", 0.03)
+        snapshot = stats.snapshot()["load"]
+        self.assertEqual(snapshot["count"], 2)
+        self.assertEqual(snapshot["histogram"], {"<=1ms": 1, "<=50ms": 1})
+        self.assertEqual(snapshot["max_ms"], 30.0)
+
+    def test_event_manager_is_instrumented(self):
+        """Test that EventManager methods record into the shared instrumentation, unless it is disabled."""
+        instrumentation.reset()
+        with tempfile.TemporaryDirectory() as tmpdir:
+            manager = EventManager(os.path.join(tmpdir, "events.csv"))
+            manager.summarize_events("today")
+            self.assertEqual(instrumentation.snapshot()["EventManager.summarize_events"]["count"], 1)
+            instrumentation.enabled = False
+            try:
+                manager.summarize_events("today")
+            finally:
+                instrumentation.enabled = True
+        self.assertEqual(instrumentation.snapshot()["EventManager.summarize_events"]["count"], 1)
+
+    def test_profile_dump(self):
+        """Test that a profiled block is dumped as cProfile data."""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            filename = os.path.join(tmpdir, "rerun.prof")
+            with Instrumentation().profile(filename):
+                sorted(range(1000))
+            self.assertGreater(os.path.getsize(filename), 0)
+
+class TestCli(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.filename = os.path.join(self.tmpdir.name, "events.csv")
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def run_cli(self, *argv):
+        out = io.StringIO()
+        status = cli_main(["--file", self.filename, *argv], out)
+        return status, out.getvalue()
+
+    def test_notify_sends_reminders_due_since_last_run(self):
+        """Test that notify logs the reminders that fell due since the previous run, once."""
+        log = os.path.join(self.tmpdir.name, "notifications.log")
+        due = (datetime.now() - timedelta(minutes=5)).strftime("%d-%m-%Y %H:%M")
+        self.run_cli("add", "Dentist", due, "--notifications", "Email")
+        self.run_cli("add", "Lunch", due, "--notifications", "None")
+        self.assertEqual(self.run_cli("notify", "--log", log), (0, "0 reminder(s) sent\n"))
+        with open(self.filename + ".notify.json", "w") as file:
+            json.dump({"version": 1, "watermark": (datetime.now() - timedelta(hours=1)).isoformat()}, file)
+        self.assertEqual(self.run_cli("notify", "--log", log), (0, "1 reminder(s) sent\n"))
+        self.assertEqual(self.run_cli("notify", "--log", log), (0, "0 reminder(s) sent\n"))
+        with open(log) as file:
+            self.assertIn("reminder: Dentist", file.read())
+
+    def test_migrate_to_user_shard(self):
+        """Test that migrate copies --file into the --user shard and refuses a second time."""
+        shards = os.path.join(self.tmpdir.name, "shards")
+        self.run_cli("add", "Dentist", "14-03-2025 09:30")
+        self.assertEqual(self.run_cli("--user", "alice", "--shards", shards, "migrate")[0], 0)
+        status, out = self.run_cli("--user", "alice", "--shards", shards, "list")
+        self.assertIn("Dentist", out)
+        with patch("sys.stderr", io.StringIO()):
+            self.assertEqual(self.run_cli("--user", "alice", "--shards", shards, "migrate")[0], 1)
+
+    def test_add_list_and_remove(self):
+        """Test that added events are listed with their IDs and can be removed by ID."""
+        status, event_id = self.run_cli("add", "Meeting", "22-11-2024 15:00", "--category", "Work")
+        self.assertEqual(status, 0)
+        event_id = event_id.strip()
+        self.assertEqual(self.run_cli("list")[1], f"{event_id}\t22-11-2024 15:00\tMeeting\tWork\n")
+        self.assertEqual(self.run_cli("remove", event_id)[0], 0)
+        self.assertEqual(self.run_cli("list")[1], "")
+        self.assertEqual(self.run_cli("remove", event_id)[0], 1)
+
+    def test_summarize_today(self):
+        """Test that the summary counts today's events per category."""
+        today = datetime.now().strftime('%d-%m-%Y')
+        self.run_cli("add", "Standup", f"{today} 00:00", "--category", "Work")
+        self.assertEqual(self.run_cli("summarize", "today")[1], "Work: 1 event(s)\n")
+
+    def test_export_and_import(self):
+        """Test that a date range exported as JSON Lines imports into another file."""
+        self.run_cli("add", "Meeting", "22-11-2024 15:00")
+        self.run_cli("add", "Lunch", "02-12-2024 12:00")
+        exported = os.path.join(self.tmpdir.name, "november.jsonl")
+        self.run_cli("export", exported, "--start", "01-11-2024", "--end", "01-12-2024")
+        other = os.path.join(self.tmpdir.name, "other.csv")
+        out = io.StringIO()
+        self.assertEqual(cli_main(["--file", other, "import", exported], out), 0)
+        self.assertEqual(out.getvalue(), "1 event(s) imported\n")
+        self.assertEqual([event.name for event in EventManager(other).events], ["Meeting"])
+
+    def test_list_includes_archived_events(self):
+        """Test that the CLI archives with --archive-after and still lists the archived events."""
+        out = io.StringIO()
+        cli_main(["--file", self.filename, "--archive-after", "30", "add", "Meeting", "22-11-2020 15:00"], out)
+        self.assertTrue(os.path.isdir(self.filename + ".archive"))
+        self.assertIn("\tMeeting\t", self.run_cli("list", "--end", "01-01-2021")[1])
+
+    def test_remove_listed_event_from_file_without_ids(self):
+        """Test that an ID listed for a file written before IDs can be removed in the next run."""
+        with open(self.filename, "w") as file:
+            file.write("name,date,comments,category,notifications\n"
+                       "Meeting,22-11-2024 15:00,,Work,Email\nLunch,22-11-2024 12:00,,Home,None\n")
+        event_id = self.run_cli("list")[1].split("\t")[0]
+        self.assertEqual(self.run_cli("remove", event_id)[0], 0)
+        self.assertEqual(self.run_cli("list")[1].count("\n"), 1)
+
+    def test_core_does_not_import_streamlit(self):
+        """Test that the data layer and the CLI load without Streamlit."""
+        code = "import sys, cli_mytodolist; print('streamlit' in sys.modules)"
+        result = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        self.assertEqual(result.stdout.strip(), "False")
+
+class TestBenchmark(unittest.TestCase):
+    def test_generate_events_is_reproducible(self):
+        """Test that the synthetic data generator is deterministic and honours its parameters."""
+        start = datetime(2024, 1, 1)
+        first = [event.to_dict() for event in generate_events(50, categories=3, days=7, start=start)]
+        second = [event.to_dict() for event in generate_events(50, categories=3, days=7, start=start)]
+        self.assertEqual(first, second)
+        self.assertLessEqual(len({row["category"] for row in first}), 3)
+
+    def test_run_benchmark_reports_every_operation(self):
+        """Test that a small run reports time, throughput and memory per operation."""
+        results = run_benchmark(200, adds=2)
+        self.assertIn("load_events", results)
+        self.assertIn("summarize_events:this_month", results)
+        self.assertIn("peak_memory_bytes", results["load_events"])
+        self.assertEqual(results["add_event"]["items"], 2)
+
+    def test_compare_results(self):
+        """Test that slower operations are reported as regressions."""
+        baseline = {"runs": {"1000": {"load_events": {"seconds": 1.0}, "save_events": {"seconds": 1.0}}}}
+        current = {"runs": {"1000": {"load_events": {"seconds": 1.1}, "save_events": {"seconds": 2.0}}}}
+        regressions = compare_results(baseline, current)
+        self.assertEqual([regression["operation"] for regression in regressions], ["save_events"])
+
 if __name__ == "__main__":
     unittest.main()
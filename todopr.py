@@ -1,62 +1,14 @@
-import csv
-from datetime import datetime, timedelta
+from datetime import datetime
 import streamlit as st
 import base64
 
+from core_mytodolist import EventManager
+
 # Function to encode an image into base64
 def get_base64_image(image_path):
     with open(image_path, "rb") as img_file:
         return base64.b64encode(img_file.read()).decode()
 
-# Class for Event and EventManager
-class Event:
-    def __init__(self, name, date, comments, category, notifications):
-        self.name = name
-        self.date = date
-        self.comments = comments
-        self.category = category
-        self.notifications = notifications
-
-    def to_dict(self):
-        return {
-            'name': self.name,
-            'date': self.date.strftime('%d-%m-%Y %H:%M'),
-            'comments': self.comments,
-            'category': self.category,
-            'notifications': self.notifications
-        }
-
-class EventManager:
-    def __init__(self, filename='events.csv'):
-        self.filename = filename
-        self.events = self.load_events()
-
-    def load_events(self):
-        events = []
-        try:
-            with open(self.filename, mode='r', newline='') as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    row['date'] = datetime.strptime(row['date'], '%d-%m-%Y %H:%M')
-                    events.append(
-                        Event(row['name'], row['date'], row['comments'], row['category'], row['notifications']))
-        except FileNotFoundError:
-            pass
-        return events
-
-    def save_events(self):
-        with open(self.filename, mode='w', newline='') as file:
-            writer = csv.DictWriter(file, fieldnames=['name', 'date', 'comments', 'category', 'notifications'])
-            writer.writeheader()
-            for event in self.events:
-                writer.writerow(event.to_dict())
-
-    def add_event(self, name, date, comments, category, notifications):
-        event = Event(name, date, comments, category, notifications)
-        self.events.append(event)
-        self.save_events()
-
-
 def show_welcome_page(image_path):
     image_path1 = "pinguin_53876-57854.jpg"
     col1, col2 = st.columns([1.5, 1])
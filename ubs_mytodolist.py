@@ -1,116 +1,60 @@
-import csv
-from datetime import datetime, timedelta
+"""Streamlit UI of the ToDo list app; the data layer lives in core_mytodolist.py."""
+import io
+from contextlib import nullcontext
+from datetime import datetime
 import streamlit as st
-import base64
-
-# Function to encode an image into base64
-def get_base64_image(image_path):
-    with open(image_path, "rb") as img_file:
-        return base64.b64encode(img_file.read()).decode()
-
-# Class for Event and EventManager
-class Event:
-    def __init__(self, name, date, comments, category, notifications):
-        self.name = name
-        self.date = date
-        self.comments = comments
-        self.category = category
-        self.notifications = notifications
-
-    def to_dict(self):
-        return {
-            'name': self.name,
-            'date': self.date.strftime('%d-%m-%Y %H:%M'),
-            'comments': self.comments,
-            'category': self.category,
-            'notifications': self.notifications
-        }
 
-class EventManager:
-    def __init__(self, filename='events.csv'):
-        self.filename = filename
-        self.events = self.load_events()
-
-    def load_events(self):
-        events = []
-        try:
-            with open(self.filename, mode='r', newline='') as file:
-                reader = csv.DictReader(file)
-                for row in reader:
-                    row['date'] = datetime.strptime(row['date'], '%d-%m-%Y %H:%M')
-                    events.append(
-                        Event(row['name'], row['date'], row['comments'], row['category'], row['notifications']))
-        except FileNotFoundError:
-            pass
-        return events
-
-    def save_events(self):
-        with open(self.filename, mode='w', newline='') as file:
-            writer = csv.DictWriter(file, fieldnames=['name', 'date', 'comments', 'category', 'notifications'])
-            writer.writeheader()
-            for event in self.events:
-                writer.writerow(event.to_dict())
-
-    def add_event(self, name, date, comments, category, notifications):
-        event = Event(name, date, comments, category, notifications)
-        self.events.append(event)
-        self.save_events()
-
-    def remove_event(self, index):
-        """Method to remove an event by its index."""
-        if 0 <= index < len(self.events):
-            self.events.pop(index)
-            self.save_events()
-
-    def filter_events(self, timeframe="today", category=""):
-        now = datetime.now()
-        filtered_events = []
-
-        if timeframe == "today":
-            start = now.replace(hour=0, minute=0, second=0, microsecond=0)
-            end = start + timedelta(days=1)
-        elif timeframe == "this_week":
-            start = now - timedelta(days=now.weekday())  # Start of this week (Monday)
-            end = start + timedelta(weeks=1)
-        elif timeframe == "this_month":
-            start = now.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
-            end = (start.replace(month=start.month % 12 + 1, day=1) if start.month < 12 else start.replace(month=1, year=start.year+1))
-
-        # Filter events based on category and timeframe
-        for event in self.events:
-            if start <= event.date < end:
-                if category.lower() in event.category.lower() if category else True:
-                    filtered_events.append(event)
-
-        return filtered_events
-
-    def summarize_events(self, timeframe):
-        now = datetime.now()
-        summary = {}
-
-        # Define the time range based on the selected timeframe
-        if timeframe == "today":
-            start_time = now.replace(hour=0, minute=0, second=0, microsecond=0)
-            end_time = now.replace(hour=23, minute=59, second=59, microsecond=999999)
-        elif timeframe == "this_week":
-            start_time = now - timedelta(days=now.weekday())  # Start of this week (Monday)
-            end_time = start_time + timedelta(days=6, hours=23, minutes=59, seconds=59)
-        elif timeframe == "this_month":
-            start_time = datetime(now.year, now.month, 1)  # First day of this month
-            end_time = datetime(now.year, now.month, 1) + timedelta(days=31)  # Rough end of the month
-            end_time = end_time.replace(hour=23, minute=59, second=59, microsecond=999999)
-
-        # Filter events within the time range
-        for event in self.events:
-            if start_time <= event.date <= end_time:
-                category = event.category
-                if category not in summary:
-                    summary[category] = 0
-                summary[category] += 1
-
-        return summary
+from core_mytodolist import EventShards, ImageCache, file_format, instrumentation, timed
+
+# Events older than this many days move to the compressed archive, which the
+# pages still list (see EventManager.page_events)
+ARCHIVE_AFTER_DAYS = 180
+
+# Widest the page images are ever shown; larger files are downscaled to this when Pillow is available
+IMAGE_DISPLAY_WIDTH = 800
+
+@st.cache_resource
+def shared_image_cache():
+    return ImageCache()
+
+@st.cache_resource
+def shared_event_shards():
+    # The events.csv all users shared before shards is moved to one of them with
+    # `python cli_mytodolist.py --user NAME migrate`
+    return EventShards(atomic=True, write_behind=True, archive_after=ARCHIVE_AFTER_DAYS)
 
 # Page Functions
+@timed('show_event_page')
+def show_event_page(manager, key):
+    """Show one page of events as a single table and return its (index, event) rows."""
+    search = st.text_input("Search", key=f"{key}_search")
+    col_sort, col_order, col_size = st.columns(3)
+    sort_by = col_sort.selectbox("Sort by", ["date", "name", "category"], key=f"{key}_sort")
+    descending = col_order.selectbox("Order", ["Ascending", "Descending"], key=f"{key}_order") == "Descending"
+    page_size = col_size.selectbox("Rows per page", [25, 50, 100], key=f"{key}_size")
+
+    # The page number is read before the widget is drawn, so one page_events call serves the rerun;
+    # a second one is only needed when the page is past the end, e.g. after narrowing the search
+    page = st.session_state.get(f"{key}_page", 1) - 1
+    total, rows = manager.page_events(page, page_size, search, sort_by, descending)
+    pages = max(1, -(-total // page_size))
+    if page >= pages:
+        page = pages - 1
+        st.session_state[f"{key}_page"] = pages
+        total, rows = manager.page_events(page, page_size, search, sort_by, descending)
+    st.number_input(f"Page (of {pages})", min_value=1, max_value=pages, key=f"{key}_page")
+    if rows:
+        st.dataframe(
+            # Archived events have no position among the loaded ones
+            [{"#": "" if idx is None else str(idx), "Name": event.name, "Date": event.date.strftime('%d-%m-%Y %H:%M'),
+              "Category": event.category, "Comments": event.comments, "Notifications": event.notifications}
+             for idx, event in rows],
+            hide_index=True, use_container_width=True,
+        )
+        st.caption(f"Showing {page * page_size + 1}-{page * page_size + len(rows)} of {total} event(s)")
+    return rows
+
+@timed('show_welcome_page')
 def show_welcome_page(image_path):
     image_path1 = "pinguin_53876-57854.jpg"
     col1, col2 = st.columns([1.5, 1])
@@ -143,12 +87,10 @@ def show_welcome_page(image_path):
                 st.warning("Please enter your name to proceed.")
 
     with col2:
-        encoded_image = get_base64_image(image_path1)
-        st.markdown(
-            f'<img src="data:image/jpg;base64,{encoded_image}" alt="Penguin" style="width:100%; height:auto;">',
-            unsafe_allow_html=True,
-        )
+        # st.image serves the bytes from Streamlit's media endpoint, so the browser caches them
+        st.image(shared_image_cache().get(image_path1, IMAGE_DISPLAY_WIDTH), use_container_width=True)
 
+@timed('show_todo_page')
 def show_todo_page(image_path):
     st.markdown(
         """
@@ -164,10 +106,15 @@ def show_todo_page(image_path):
 
     with col1:
         st.subheader(f"Hello {st.session_state.get('name', 'User')}, welcome to your ToDo List!")
-        manager = EventManager()
+        manager = shared_event_shards().manager(st.session_state.get('name', 'User'))
+        if manager.load_errors:
+            st.warning(f"{manager.load_errors} malformed row(s) in the events file were skipped.")
+        if manager.save_error is not None:
+            st.error(f"Your latest changes could not be saved yet ({manager.save_error}); retrying.")
 
         option = st.selectbox("Select an option",
-                              ["Add Event", "Remove Event", "List Events", "Filter Events", "Summarize Events"])
+                              ["Add Event", "Remove Event", "List Events", "Filter Events", "Summarize Events",
+                               "Import Events"])
 
         if option == "Add Event":
             name = st.text_input("Event Name")
@@ -183,31 +130,32 @@ def show_todo_page(image_path):
                 st.success("Event added successfully!")
 
         elif option == "Remove Event":
-            events = manager.events
-            if events:
-                event_names = [f"{idx}: {event.name} - {event.date.strftime('%d-%m-%Y %H:%M')} - {event.category}" for idx, event in enumerate(events)]
-                event_to_remove = st.selectbox("Select an event to remove", event_names)
-                index = int(event_to_remove.split(":")[0])
+            # Only the rows of the current page are offered, so only those get formatted
+            rows = show_event_page(manager, "remove")
+            if rows:
+                event = st.selectbox(
+                    "Select an event to remove", [event for idx, event in rows],
+                    format_func=lambda event: f"{event.name} - {event.date.strftime('%d-%m-%Y %H:%M')} - {event.category}")
                 if st.button("Remove Event"):
-                    manager.remove_event(index)
-                    st.success("Event removed successfully!")
+                    # By ID, so changes other sessions made since the page was shown cannot shift the target
+                    if manager.remove_event_by_id(event.id) is None:
+                        st.warning("That event was already removed.")
+                    else:
+                        st.success("Event removed successfully!")
             else:
                 st.write("No events found to remove.")
 
         elif option == "List Events":
-            events = manager.events
-            if not events:
+            if not show_event_page(manager, "list"):
                 st.write("No events found.")
-            else:
-                for idx, event in enumerate(events):
-                    st.write(f"{idx}: {event.name} - {event.date.strftime('%d-%m-%Y %H:%M')} - {event.category}")
 
         elif option == "Filter Events":
             timeframe = st.selectbox("Timeframe", ["today", "this_week", "this_month"])
             category = st.text_input("Category (leave blank for all)")
+            keywords = st.text_input("Keywords in name, comments or category (leave blank for all)")
 
             if st.button("Filter Events"):
-                filtered_events = manager.filter_events(timeframe, category)
+                filtered_events = manager.filter_events(timeframe, category, keywords)
                 if not filtered_events:
                     st.write("No events found for the specified criteria.")
                 else:
@@ -224,15 +172,35 @@ def show_todo_page(image_path):
                     for category, count in summary.items():
                         st.write(f"{category}: {count} event(s)")
 
+        elif option == "Import Events":
+            uploaded = st.file_uploader("CSV or JSON Lines file", type=["csv", "jsonl", "ndjson"])
+            if uploaded is not None and st.button("Import Events"):
+                text = io.TextIOWrapper(uploaded, encoding="utf-8", newline="")
+                added, skipped = manager.import_events(text, file_format(uploaded.name))
+                st.success(f"{added} event(s) imported.")
+                if skipped:
+                    st.warning(f"{skipped} invalid record(s) were skipped.")
+
         if st.button("Back to Welcome Page"):
             st.session_state["page"] = "welcome"
 
     with col2:
-        encoded_image = get_base64_image(image_path)
-        st.markdown(
-            f'<img src="data:image/jpg;base64,{encoded_image}" alt="Penguin" style="width:100%; height:100%;">',
-            unsafe_allow_html=True,
-        )
+        st.image(shared_image_cache().get(image_path, IMAGE_DISPLAY_WIDTH), use_container_width=True)
+
+def show_diagnostics():
+    """Hidden operator view with the instrumentation numbers, shown when the URL has ?diagnostics=1."""
+    with st.expander("Diagnostics", expanded=True):
+        instrumentation.enabled = st.toggle("Instrumentation enabled", value=instrumentation.enabled)
+        stats = instrumentation.snapshot()
+        if stats:
+            st.dataframe([{"timer": name, **{key: value for key, value in timer.items() if key != "histogram"}}
+                          for name, timer in stats.items()], hide_index=True, use_container_width=True)
+        col_json, col_profile, col_reset = st.columns(3)
+        col_json.download_button("Download JSON", instrumentation.to_json(), "diagnostics.json", "application/json")
+        if col_profile.button("Profile next rerun"):
+            st.session_state["profile_next_rerun"] = True
+        if col_reset.button("Reset timers"):
+            instrumentation.reset()
 
 def main():
     st.set_page_config(page_title="ToDo List", layout="wide")
@@ -240,10 +208,18 @@ def main():
         st.session_state["page"] = "welcome"
 
     image_path = "pinpin.jpg"
-    if st.session_state["page"] == "welcome":
-        show_welcome_page(image_path)
-    elif st.session_state["page"] == "todo":
-        show_todo_page(image_path)
+    profile = None
+    if st.session_state.pop("profile_next_rerun", False):
+        profile = f"rerun-{datetime.now().strftime('%Y%m%d-%H%M%S')}.prof"
+    with instrumentation.profile(profile) if profile else nullcontext():
+        if st.session_state["page"] == "welcome":
+            show_welcome_page(image_path)
+        elif st.session_state["page"] == "todo":
+            show_todo_page(image_path)
+    if st.query_params.get("diagnostics") == "1":
+        if profile:
+            st.info(f"cProfile dump of this rerun written to {profile}")
+        show_diagnostics()
 
 if __name__ == "__main__":
     main()